@@ -0,0 +1,69 @@
+import argparse
+import random
+import time
+
+from dumbo_asp.primitives.models import Model
+from dumbo_asp.primitives.predicates import Predicate
+
+from xasp.contexts import ProcessAggregatesContext
+from xasp.entities import Explain, PROCESS_AGGREGATES_ENCODING
+from xasp.utils import PROJECT_ROOT
+
+
+def aggregate_heavy(groups: int, elements: int, seed: int = 0) -> tuple[str, Model, Model]:
+    """Each group has a choice over its elements and one rule for each aggregate function."""
+    rng = random.Random(seed)
+    program = f"""
+        group(1..{groups}).
+        element(1..{elements}).
+        {{in(G,E)}} :- group(G), element(E).
+        sum_ok(G) :- group(G), #sum{{E : in(G,E)}} >= {elements * elements // 4}.
+        count_ok(G) :- group(G), #count{{E : in(G,E)}} = {elements // 2}.
+        min_ok(G) :- group(G), #min{{E : in(G,E)}} < 3.
+        max_ok(G) :- group(G), 2 <= #max{{E : in(G,E)}} <= {elements - 1}.
+    """
+    chosen = [f"chosen({group},{element})." for group in range(1, groups + 1) for element in range(1, elements + 1)
+              if rng.random() < 0.5]
+    answer_set = Model.of_program(program, chosen, "in(G,E) :- chosen(G,E).", ":- in(G,E), not chosen(G,E).") \
+        .drop(Predicate.parse("chosen/2"))
+    base = Model.of_atoms(f"in({group},{element})" for group in range(1, groups + 1)
+                          for element in range(1, elements + 1))
+    return program, answer_set, base
+
+
+def run(workload: str, serialization: Model) -> None:
+    start = time.perf_counter()
+    expected = Explain.compute_stable_model(PROCESS_AGGREGATES_ENCODING + serialization.as_facts,
+                                            context=ProcessAggregatesContext())
+    encoding_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = ProcessAggregatesContext().process_aggregates(serialization)
+    native_time = time.perf_counter() - start
+
+    assert actual.sorted == expected
+    print(f"{workload:>24} {len(serialization):>8} atoms  encoding {encoding_time:8.3f}s  native {native_time:8.3f}s  "
+          f"speed-up {encoding_time / native_time:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PROCESS_AGGREGATES_ENCODING with the native processor.")
+    parser.add_argument("--groups", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--elements", type=int, default=20)
+    parser.add_argument("--no-xai", action="store_true", help="skip examples/xai.lp (serialization takes a while)")
+    args = parser.parse_args()
+
+    for groups in args.groups:
+        program, answer_set, base = aggregate_heavy(groups, args.elements)
+        explain = Explain.the_program(program, the_answer_set=answer_set, the_additional_atoms_in_the_base=base)
+        run(f"groups={groups},elements={args.elements}", explain.serialization)
+    if not args.no_xai:
+        explain = Explain.the_program(
+            (PROJECT_ROOT / "examples/xai.lp").read_text(),
+            the_answer_set=Model.of_program((PROJECT_ROOT / "examples/xai.answer_set.lp").read_text()),
+        )
+        run("xai", explain.serialization)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import time
+
+from benchmarks.suite import chain, three_colouring
+from xasp.cache import set_default_cache
+from xasp.entities import Explain
+from xasp.parallel import Job, explain_all
+
+
+def jobs(args) -> list[Job]:
+    res = []
+    for copy in range(args.copies):
+        for size in args.chain:
+            program, answer_set, base, atoms_to_explain = chain(size + copy)
+            res.append(Job(program, answer_set, atoms_to_explain, base))
+        for nodes in args.three_colouring:
+            program, answer_set, base, atoms_to_explain = three_colouring(nodes, seed=copy)
+            res.append(Job(program, answer_set, atoms_to_explain, base))
+    return res
+
+
+def sequential(the_jobs: list[Job]) -> list[str]:
+    return [
+        str(Explain.the_program(
+            job.program,
+            the_answer_set=job.answer_set,
+            the_atoms_to_explain=job.atoms_to_explain,
+            the_additional_atoms_in_the_base=job.additional_atoms_in_the_base,
+        ).explanation_dag())
+        for job in the_jobs
+    ]
+
+
+def pool(the_jobs: list[Job], workers: int, threads: bool) -> list[str]:
+    res = [""] * len(the_jobs)
+    for result in explain_all(the_jobs, workers=workers, threads=threads):
+        assert result.error is None, result.error
+        res[result.index] = str(result.dag)
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare explain_all() on threads and processes with a loop.")
+    parser.add_argument("--chain", type=int, nargs="*", default=[1_000, 2_000])
+    parser.add_argument("--three-colouring", type=int, nargs="*", default=[50])
+    parser.add_argument("--copies", type=int, default=4, help="jobs per workload (on different instances)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    set_default_cache(None)
+    the_jobs = jobs(args)
+    start = time.perf_counter()
+    expected = sequential(the_jobs)
+    baseline = time.perf_counter() - start
+    print(f"{len(the_jobs)} jobs  {'sequential':>10} {'':>10} {baseline:8.3f}s")
+    for workers in args.workers:
+        for threads in [True, False]:
+            start = time.perf_counter()
+            assert pool(the_jobs, workers, threads) == expected
+            elapsed = time.perf_counter() - start
+            print(f"{len(the_jobs)} jobs  {'threads' if threads else 'processes':>10} {workers:>10} "
+                  f"{elapsed:8.3f}s  speed-up {baseline / elapsed:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
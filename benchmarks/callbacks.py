@@ -0,0 +1,243 @@
+import argparse
+import time
+from pathlib import Path
+
+import clingo
+from dumbo_asp.primitives.models import Model
+
+from xasp.contexts import ComputeWellFoundedContext, ComputeExplanationContext
+from xasp.entities import Explain, WELL_FOUNDED_ENCODING, INDEXED_EXPLAIN_ENCODING, EXPLANATION_ENCODING, \
+    EXPLAIN_ENCODING
+from xasp.utils import PROJECT_ROOT
+
+LEGACY_INDEXED_EXPLAIN_ENCODING = """
+%% INDEXED_EXPLAIN_ENCODING up to xasp 0.8.4, numbering atoms with @index() during grounding
+has_explanation(Atom) :- indexed_explained_by(_,Atom,_).
+
+indexed_explained_by(@index(), Atom, assumption) :- assume_false(Atom).
+indexed_explained_by(@index(), Atom, initial_well_founded) :- false(Atom), explained_by(Atom, initial_well_founded).
+
+% true atoms can be explained by a supporting rule whose body literals already have an explanation
+indexed_explained_by(@index(), Atom, (support, Rule)) :-
+  explained_by(Atom, (support, Rule));
+  true(Atom);
+  head(Rule,Atom);
+  true(BAtom) : pos_body(Rule,BAtom);
+  has_explanation(BAtom) : pos_body(Rule,BAtom);
+  false(BAtom) : neg_body(Rule,BAtom);
+  has_explanation(BAtom) : neg_body(Rule,BAtom).
+
+
+% explain false atoms : begin
+
+    % false atoms can be explained if all the possibly supporting rules already have an explanation
+    indexed_explained_by(@index(), Atom, lack_of_support) :-
+      explained_by(Atom, lack_of_support);
+      false(Atom);
+      false_body(Rule) : head(Rule,Atom).
+
+    % a non-supporting rule is explained if there is some false body literal that already has an explanation
+    false_body(Rule) :-
+      rule(Rule);
+      pos_body(Rule,BAtom), false(BAtom), has_explanation(BAtom).
+    false_body(Rule) :-
+      rule(Rule);
+      neg_body(Rule,BAtom), true(BAtom), has_explanation(BAtom).
+
+
+    % a false atom can be explained by a rule with false head and whose body contains the false atom, and all other body literals are true
+    indexed_explained_by(@index(), Atom, (required_to_falsify_body, Rule)) :-
+      explained_by(Atom, (required_to_falsify_body, Rule));
+      false(Atom), not aggregate(Atom);
+      pos_body(Rule,Atom), false_head(Rule);
+      true(BAtom) : pos_body(Rule,BAtom), BAtom != Atom;
+      has_explanation(BAtom) : pos_body(Rule,BAtom), BAtom != Atom;
+      false(BAtom) : neg_body(Rule,BAtom);
+      has_explanation(BAtom) : neg_body(Rule,BAtom).
+    explained_head(Rule) :-
+      rule(Rule);
+      has_explanation(HAtom) : head(Rule,HAtom).
+    false_head(Rule) :-
+      explained_head(Rule), not choice(Rule,_,_);
+      false(HAtom) : head(Rule,HAtom).
+    false_head(Rule) :-
+      explained_head(Rule), choice(Rule, LowerBound, UpperBound);
+      not LowerBound <= #count{HAtom : head(Rule,HAtom), true(HAtom)} <= UpperBound.
+
+    % a false atom can be explained by a choice rule with true body and whose true head atoms already reach the upper bound
+    indexed_explained_by(@index(), Atom, (choice_rule, Rule)) :-
+      explained_by(Atom, (choice_rule, Rule));
+      false(Atom);
+      head(Rule,Atom), choice(Rule, LowerBound, UpperBound), UpperBound != unbounded;
+      true(BAtom) : pos_body(Rule,BAtom);
+      has_explanation(BAtom) : pos_body(Rule,BAtom);
+      false(BAtom) : neg_body(Rule,BAtom);
+      has_explanation(BAtom) : neg_body(Rule,BAtom);
+      #count{HAtom : head(Rule, HAtom), true(HAtom), has_explanation(HAtom)} = UpperBound.
+
+% explain false atoms : end
+
+
+% keep only atoms connected to the query : begin
+
+    relevant(Atom) :- explain(Atom).
+    relevant(Atom) :- not explain(_); indexed_explained_by(_, Atom, _).
+
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (support, Rule));
+        pos_body(Rule, Atom').
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (support, Rule));
+        neg_body(Rule, Atom').
+
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (lack_of_support));
+        head(Rule, Atom);
+        pos_body(Rule, Atom'), false(Atom'), indexed_explained_by(Index', Atom', _), Index' < Index.
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (lack_of_support));
+        head(Rule, Atom);
+        neg_body(Rule, Atom'), true(Atom'), indexed_explained_by(Index', Atom', _), Index' < Index.
+
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (required_to_falsify_body, Rule));
+        head(Rule, Atom').
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (required_to_falsify_body, Rule));
+        pos_body(Rule, Atom').
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (required_to_falsify_body, Rule));
+        neg_body(Rule, Atom').
+
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (choice_rule, Rule));
+        head(Rule, Atom'), true(Atom').
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (choice_rule, Rule));
+        pos_body(Rule, Atom').
+    relevant(Atom') :-
+        relevant(Atom), indexed_explained_by(Index, Atom, (choice_rule, Rule));
+        neg_body(Rule, Atom').
+
+% keep only atoms connected to the query : end
+
+#show.
+#show explained_by(Index, Atom, Reason) : indexed_explained_by(Index, Atom, Reason), relevant(Atom).
+
+% avoid warnings
+rule(0) :- #false.
+choice(0,0,0) :- #false.
+head(0,0) :- #false.
+pos_body(0,0) :- #false.
+neg_body(0,0) :- #false.
+aggregate(0) :- #false.
+explain(0) :- #false.
+true(0) :- #false.
+false(0) :- #false.
+explained_by(0,0) :- #false.
+assume_false(0) :- #false.
+"""
+
+
+class LegacyComputeExplanationContext:
+    def __init__(self):
+        self.__index = 0
+
+    def index(self):
+        self.__index += 1
+        return clingo.Number(self.__index)
+
+
+def ground_and_solve(program: str, context=None) -> tuple[float, set]:
+    start = time.perf_counter()
+    control = clingo.Control()
+    control.add("base", [], program)
+    control.ground([("base", [])], context=context)
+    grounding_time = time.perf_counter() - start
+    res = set()
+    control.solve(on_model=lambda model: res.update(model.symbols(shown=True)))
+    return grounding_time, res
+
+
+def well_founded(explain: Explain) -> None:
+    serialization = explain.serialization
+    grounding_time, legacy = ground_and_solve(WELL_FOUNDED_ENCODING + serialization.as_facts,
+                                              context=ComputeWellFoundedContext())
+
+    start = time.perf_counter()
+    well_founded_model = ComputeWellFoundedContext.of_serialization(serialization).well_founded_model
+    actual = {clingo.Function("explained_by", [atom.arguments[0], clingo.Function("initial_well_founded")])
+              for atom in serialization
+              if atom.value.name == "false" and atom.value.arguments[0] not in well_founded_model.potentially_true}
+    bulk_time = time.perf_counter() - start
+
+    assert actual == legacy
+    report("WELL_FOUNDED_ENCODING", grounding_time, bulk_time)
+
+
+def indexed_explain(explain: Explain) -> None:
+    instance = explain.minimal_assumption_set().as_facts + explain.serialization.as_facts + \
+        explain.atoms_explained_by_initial_well_founded.as_facts
+    explained_by = Explain.compute_stable_model(EXPLANATION_ENCODING + EXPLAIN_ENCODING + instance).as_facts
+
+    grounding_time, legacy = ground_and_solve(LEGACY_INDEXED_EXPLAIN_ENCODING + instance + explained_by,
+                                              context=LegacyComputeExplanationContext())
+
+    start = time.perf_counter()
+    control = clingo.Control()
+    control.add("base", [], INDEXED_EXPLAIN_ENCODING + instance + explained_by)
+    control.ground([("base", [])])
+    callback_free_time = time.perf_counter() - start
+    derived = set()
+    control.solve(on_model=lambda model: derived.update(model.symbols(shown=True)))
+    actual = ComputeExplanationContext.of_serialization(explain.serialization).indexed_explanation_sequence([
+        tuple(atom.symbol.arguments)
+        for atom in control.symbolic_atoms.by_signature("indexed_explained_by", 2)
+        if atom.symbol in derived
+    ])
+
+    assert sequence(atom.value for atom in actual) == sequence(legacy)
+    report("INDEXED_EXPLAIN_ENCODING", grounding_time, callback_free_time)
+
+
+def sequence(explained_by) -> tuple[set, list]:
+    """
+    The atoms explained by assumption or by the initial well-founded model, and the other explained atoms with their
+    reasons by increasing index.
+    The former do not depend on other atoms, so the grounder may number them in any order.
+    Indices are compared only by order, as the legacy encoding numbers also the atoms not connected to the query.
+    """
+    independent, res = set(), []
+    for _, atom, reason in sorted((tuple(symbol.arguments) for symbol in explained_by),
+                                  key=lambda arguments: arguments[0].number):
+        if reason.type == clingo.SymbolType.Function and reason.name in ["assumption", "initial_well_founded"]:
+            independent.add(atom)
+        else:
+            res.append((atom, reason))
+    return independent, res
+
+
+def report(encoding: str, legacy_time: float, time_: float) -> None:
+    print(f"{encoding:>28}  with callbacks {legacy_time:8.3f}s  callback-free {time_:8.3f}s  "
+          f"speed-up {legacy_time / time_:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare grounding with and without Python callbacks.")
+    parser.add_argument("--program", type=Path, default=PROJECT_ROOT / "examples/xai.lp")
+    parser.add_argument("--answer-set", type=Path, default=PROJECT_ROOT / "examples/xai.answer_set.lp")
+    parser.add_argument("--atom", type=str, default="h(core_assumedInfectiousWithDisease,121)")
+    args = parser.parse_args()
+
+    explain = Explain.the_program(
+        args.program.read_text(),
+        the_answer_set=Model.of_program(args.answer_set.read_text()),
+        the_atoms_to_explain=Model.of_atoms(args.atom),
+    )
+    explain.process_aggregates()
+    well_founded(explain)
+    indexed_explain(explain)
+
+
+if __name__ == "__main__":
+    main()
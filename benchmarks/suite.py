@@ -0,0 +1,180 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import clingo
+from dumbo_asp.primitives.models import Model
+
+from benchmarks.aggregates import aggregate_heavy
+from xasp.cache import set_default_cache
+from xasp.entities import Explain
+from xasp.utils import PROJECT_ROOT
+
+STEPS = (
+    "the_program",
+    "process_aggregates",
+    "compute_atoms_explained_by_initial_well_founded",
+    "prune_serialization",
+    "compute_minimal_assumption_set",
+    "compute_explanation_sequence",
+    "compute_explanation_dag",
+    "compute_igraph",
+)
+
+
+Workload = Callable[[], tuple[str, Model, Model, Model]]
+
+
+def chain(size: int) -> tuple[str, Model, Model, Model]:
+    """A chain of size atoms, each supported by the previous one."""
+    program = f"a(1). a(I+1) :- a(I), I < {size}."
+    answer_set = Model.of_atoms(*(f"a({index})" for index in range(1, size + 1)))
+    return program, answer_set, Model.empty(), Model.of_atoms(f"a({size})")
+
+
+def three_colouring(nodes: int, seed: int = 0) -> tuple[str, Model, Model, Model]:
+    """The encoding of test_3_col on a random 3-colourable graph with about 2 edges per node."""
+    rng = random.Random(seed)
+    colours = ["red", "blue", "yellow"]
+    hidden = {node: rng.choice(colours) for node in range(1, nodes + 1)}
+    edges = set()
+    while len(edges) < 2 * nodes:
+        source, target = rng.sample(range(1, nodes + 1), 2)
+        if hidden[source] != hidden[target]:
+            edges.add((min(source, target), max(source, target)))
+    program = '\n'.join([
+        f"node(1..{nodes}).",
+        *(f"edge({source},{target})." for source, target in sorted(edges)),
+        ' '.join(f"color({colour})." for colour in colours),
+        "{colored(X,C)} :- node(X), color(C).",
+        ":- node(X), #count{C : colored(X,C)} != 1.",
+        ":- edge(X,Y), colored(X, Z), colored(Y, Z).",
+    ])
+    answer_set = Explain.compute_stable_model(program)
+    base = Model.of_atoms(*(f"colored({node},{colour})" for node in range(1, nodes + 1) for colour in colours
+                            if f"colored({node},{colour})" not in (str(atom) for atom in answer_set)))
+    colour = next(atom for atom in answer_set if atom.predicate_name == "colored" and atom.arguments[0].number == 1)
+    return program, answer_set, base, Model.of_atoms(colour)
+
+
+def aggregates(groups: int, elements: int) -> tuple[str, Model, Model, Model]:
+    """The aggregate-heavy programs of benchmarks.aggregates."""
+    program, answer_set, base = aggregate_heavy(groups, elements)
+    return program, answer_set, base, Model.of_atoms("min_ok(1)")
+
+
+def xai() -> tuple[str, Model, Model, Model]:
+    return (
+        (PROJECT_ROOT / "examples/xai.lp").read_text(),
+        Model.of_program((PROJECT_ROOT / "examples/xai.answer_set.lp").read_text()),
+        Model.empty(),
+        Model.of_atoms("h(core_assumedInfectiousWithDisease,121)"),
+    )
+
+
+def workloads(args) -> dict[str, Workload]:
+    res = {}
+    for size in args.chain:
+        res[f"chain-{size}"] = lambda size=size: chain(size)
+    for nodes in args.three_colouring:
+        res[f"3-col-{nodes}"] = lambda nodes=nodes: three_colouring(nodes)
+    for groups in args.aggregates:
+        res[f"aggregates-{groups}x{args.elements}"] = lambda groups=groups: aggregates(groups, args.elements)
+    if not args.no_xai:
+        res["xai"] = xai
+    return res
+
+
+def run(workload: Workload) -> dict:
+    program, answer_set, base, atoms_to_explain = workload()
+    steps = {}
+
+    start = time.perf_counter()
+    explain = Explain.the_program(
+        program,
+        the_answer_set=answer_set,
+        the_atoms_to_explain=atoms_to_explain,
+        the_additional_atoms_in_the_base=base,
+    )
+    steps["the_program"] = time.perf_counter() - start
+    for step in STEPS[1:]:
+        start = time.perf_counter()
+        getattr(explain, step)()
+        steps[step] = time.perf_counter() - start
+
+    return {
+        "steps": steps,
+        "total": sum(steps.values()),
+        "serialization": len(explain.serialization),
+        "dag": len(explain.explanation_dag()),
+        "stages": explain.stats_report(),
+    }
+
+
+def best_of(results: list[dict]) -> dict:
+    res = min(results, key=lambda result: result["total"])
+    res["steps"] = {step: min(result["steps"][step] for result in results) for step in STEPS}
+    res["total"] = sum(res["steps"].values())
+    res["repetitions"] = len(results)
+    return res
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for step in (*STEPS, "total"):
+            current = result["steps"][step] if step != "total" else result["total"]
+            previous = baseline[name]["steps"][step] if step != "total" else baseline[name]["total"]
+            ratio = current / previous if previous > 0 else 1.0
+            regression = current - previous > 0.01 and ratio > 1 + tolerance
+            ok = ok and not regression
+            print(f"{name:>24} {step:>48} {previous:8.3f}s -> {current:8.3f}s  {ratio:6.2f}x"
+                  f"{'  REGRESSION' if regression else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every public step of Explain on bundled and synthetic programs.")
+    parser.add_argument("--chain", type=int, nargs="*", default=[1_000, 10_000])
+    parser.add_argument("--three-colouring", type=int, nargs="*", default=[20, 100])
+    parser.add_argument("--aggregates", type=int, nargs="*", default=[10, 50])
+    parser.add_argument("--elements", type=int, default=20)
+    parser.add_argument("--no-xai", action="store_true", help="skip examples/xai.lp")
+    parser.add_argument("--repeat", type=int, default=1, help="report the best of this many runs")
+    parser.add_argument("--output", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare with the results stored in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown above which a step is reported as a regression")
+    args = parser.parse_args()
+
+    set_default_cache(None)
+    results = {}
+    for name, workload in workloads(args).items():
+        results[name] = best_of([run(workload) for _ in range(args.repeat)])
+        print(f"{name:>24} {results[name]['total']:8.3f}s  " +
+              '  '.join(f"{step} {results[name]['steps'][step]:.3f}s" for step in STEPS))
+
+    if args.output is not None:
+        args.output.write_text(json.dumps({
+            "environment": {
+                "python": platform.python_version(),
+                "clingo": clingo.__version__,
+                "platform": platform.platform(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "workloads": results,
+        }, indent=2))
+    if args.baseline is not None and not compare(results, json.loads(args.baseline.read_text())["workloads"],
+                                                 args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
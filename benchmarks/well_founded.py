@@ -0,0 +1,148 @@
+import argparse
+import time
+from collections import defaultdict
+from functools import cached_property
+from pathlib import Path
+
+import clingo
+from dumbo_asp.primitives.models import Model
+
+from xasp.contexts import ComputeWellFoundedContext
+from xasp.entities import Explain
+from xasp.utils import PROJECT_ROOT
+
+
+class LegacyComputeWellFoundedContext(ComputeWellFoundedContext):
+    """The rescanning implementation shipped up to xasp 0.8.4, kept as a baseline."""
+
+    @cached_property
+    def well_founded_model(self) -> 'ComputeWellFoundedContext.WellFoundedModel':
+        well_founded_model = self.WellFoundedModel(
+            set(),
+            set().union(*(rule.head for rule in self.rules.values() if rule.head))
+        )
+        source_pointer = {atom: None for atom in well_founded_model.potentially_true}
+
+        while True:
+            queue = list(set().union(*(rule.head for rule in self.rules.values() if
+                                       len(rule.pos_body) + len(rule.neg_body) == 0 and rule.head)))
+            while queue:
+                true_atom = queue.pop()
+                if true_atom in well_founded_model.true:
+                    continue
+                well_founded_model.true.add(true_atom)
+                for rule in self.atom2pos_bodies[true_atom]:
+                    if all(atom in well_founded_model.true for atom in rule.pos_body) and \
+                            all(atom not in well_founded_model.potentially_true for atom in rule.neg_body):
+                        queue.extend(rule.head)
+
+            queue = []
+            for rule in self.rules.values():
+                self.enqueue_if_source_pointer(rule, queue, source_pointer, well_founded_model)
+            while queue:
+                for rule in self.atom2pos_bodies[queue.pop()]:
+                    self.enqueue_if_source_pointer(rule, queue, source_pointer, well_founded_model)
+            founded_atoms = set(atom for atom in source_pointer if source_pointer[atom] is not None)
+            unfounded_atoms = well_founded_model.potentially_true - founded_atoms
+            if not unfounded_atoms:
+                break
+            well_founded_model.potentially_true.difference_update(unfounded_atoms)
+        return well_founded_model
+
+    @staticmethod
+    def enqueue_if_source_pointer(rule, my_queue, source_pointer, well_founded_model):
+        if all(source_pointer[head_atom] is not None for head_atom in rule.head):
+            return
+        if any(atom not in well_founded_model.potentially_true for atom in rule.pos_body):
+            return
+        if any(atom in well_founded_model.true for atom in rule.neg_body):
+            return
+        if all(source_pointer[atom] is not None for atom in rule.pos_body):
+            for head_atom in rule.head:
+                if source_pointer[head_atom] is None:
+                    source_pointer[head_atom] = rule
+                    my_queue.append(head_atom)
+
+
+def atom(name: str, *arguments: int) -> clingo.Symbol:
+    return clingo.Function(name, [clingo.Number(argument) for argument in arguments])
+
+
+def chain(size: int) -> list[tuple]:
+    """a(0).  a(I) :- a(I-1).  b(I) :- a(I), not c(I).  c(I) :- b(I), not a(I).  d :- a(0), ..., a(size-1)."""
+    rules = [(atom("r", 0), [atom("a", 0)], [], [])]
+    for index in range(1, size):
+        rules.append((atom("r", index), [atom("a", index)], [atom("a", index - 1)], []))
+    for index in range(size):
+        rules.append((atom("s", index), [atom("b", index)], [atom("a", index)], [atom("c", index)]))
+        rules.append((atom("t", index), [atom("c", index)], [atom("b", index)], [atom("a", index)]))
+    rules.append((atom("u"), [atom("d")], [atom("a", index) for index in range(size)], []))
+    return rules
+
+
+def cycle(size: int) -> list[tuple]:
+    """a(I) :- a(I+1).  (all unfounded)  b(I) :- not a(I).  d :- a(0), ..., a(size-1)."""
+    rules = []
+    for index in range(size):
+        rules.append((atom("r", index), [atom("a", index)], [atom("a", (index + 1) % size)], []))
+        rules.append((atom("s", index), [atom("b", index)], [], [atom("a", index)]))
+    rules.append((atom("t"), [atom("d")], [atom("a", index) for index in range(size)], []))
+    return rules
+
+
+def xai() -> list[tuple]:
+    explain = Explain.the_program(
+        (PROJECT_ROOT / "examples/xai.lp").read_text(),
+        the_answer_set=Model.of_program((PROJECT_ROOT / "examples/xai.answer_set.lp").read_text()),
+    )
+    explain.process_aggregates()
+    rules = defaultdict(lambda: ([], [], []))
+    for element in explain.serialization:
+        if element.predicate_name == "rule":
+            rules[element.arguments[0]]
+        elif element.predicate_name in ["head", "pos_body", "neg_body"]:
+            index = ["head", "pos_body", "neg_body"].index(element.predicate_name)
+            rules[element.arguments[0]][index].append(element.arguments[1])
+    return [(rule, *content) for rule, content in rules.items()]
+
+
+def load(context_class, rules: list[tuple]) -> ComputeWellFoundedContext:
+    context = context_class()
+    for rule, head, pos_body, neg_body in rules:
+        context.collect_rule(rule)
+        for atom_ in head:
+            context.collect_head(rule, atom_)
+        for atom_ in pos_body:
+            context.collect_pos_body(rule, atom_)
+        for atom_ in neg_body:
+            context.collect_neg_body(rule, atom_)
+    return context
+
+
+def run(workload: str, rules: list[tuple]) -> None:
+    results = {}
+    for context_class in [LegacyComputeWellFoundedContext, ComputeWellFoundedContext]:
+        context = load(context_class, rules)
+        start = time.perf_counter()
+        results[context_class] = context.well_founded_model
+        elapsed = time.perf_counter() - start
+        print(f"{workload:>12} {len(rules):>8} rules  {context_class.__name__:<36} {elapsed:10.4f}s")
+    legacy, current = results.values()
+    assert legacy.true == current.true and legacy.potentially_true == current.potentially_true
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare well-founded engines on synthetic and bundled workloads.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    parser.add_argument("--no-xai", action="store_true", help="skip examples/xai.lp (serialization takes a while)")
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run("chain", chain(size))
+        run("cycle", cycle(size))
+    if not args.no_xai:
+        run("xai", xai())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import random
+
+import clingo
+import pytest
+from dumbo_asp.primitives.models import Model
+
+from xasp.cache import DirectoryCache, set_default_cache
+from xasp.entities import Explain
+from xasp.queries import compute_serialization, compute_explanation_dag, compute_minimal_assumption_sets
+
+
+@pytest.fixture
+def cache(tmp_path):
+    res = DirectoryCache(tmp_path / "cache")
+    set_default_cache(res)
+    yield res
+    set_default_cache(None)
+
+
+def test_directory_cache_stores_models_and_none(tmp_path):
+    cache = DirectoryCache(tmp_path)
+    cache["a"] = Model.of_atoms("p(1,\"x\\ny\")", "-q", sort=False)
+    cache["b"] = None
+    assert cache["a"] == Model.of_atoms("p(1,\"x\\ny\")", "-q", sort=False)
+    assert cache["b"] is None
+    assert "b" in cache
+    assert "c" not in cache
+    with pytest.raises(KeyError):
+        cache["c"]
+
+
+def test_directory_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = DirectoryCache(tmp_path, max_size=1)
+    cache["a"] = Model.of_atoms("a")
+    assert len(cache) == 0
+    cache = DirectoryCache(tmp_path, max_size=10_000)
+    for key in "abc":
+        cache[key] = Model.of_atoms(*(f"{key}({i})" for i in range(1000)))
+        cache[key]
+    cache = DirectoryCache(tmp_path, max_size=cache.size - 1)
+    cache["a"]
+    cache["d"] = Model.of_atoms("d")
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_explanation_dag_is_answered_from_the_cache(cache, monkeypatch):
+    program = """
+        {a}.
+        b :- a.
+        c :- b, not d.
+    """
+    answer_set = Model.of_atoms("a", "b", "c")
+    serialization = compute_serialization(program, answer_set, atoms_to_explain=Model.of_atoms("c"))
+    dag = compute_explanation_dag(serialization)
+    full_dag = Explain.the_program(program, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("c"))\
+        .explanation_dag()
+    assert len(cache) > 0
+
+    def fail(*args, **kwargs):
+        assert False, "clingo must not be called"
+    monkeypatch.setattr(clingo, "Control", fail)
+    assert compute_serialization(program, answer_set, atoms_to_explain=Model.of_atoms("c")) == serialization
+    assert compute_explanation_dag(serialization) == dag
+    assert Explain.the_program(
+        program,
+        the_answer_set=answer_set,
+        the_atoms_to_explain=Model.of_atoms("c"),
+    ).explanation_dag() == full_dag
+
+
+def test_enumeration_continues_after_cached_minimal_assumption_sets(cache):
+    program = """
+        {a; b}.
+        c :- a.
+        c :- b.
+    """
+    serialization = compute_serialization(program, Model.of_atoms("a", "b", "c"), atoms_to_explain=Model.of_atoms("c"))
+    first = compute_minimal_assumption_sets(serialization, Model.of_atoms("c"), up_to=1)
+    assert len(first) == 1
+    all_sets = compute_minimal_assumption_sets(serialization, Model.of_atoms("c"))
+    assert all_sets[0] == first[0]
+    set_default_cache(None)
+    assert compute_minimal_assumption_sets(serialization, Model.of_atoms("c")) == all_sets
+
+
+def test_non_optimal_minimal_assumption_sets_are_not_cached(cache):
+    rng = random.Random(0)
+    explain = Explain.the_program(
+        '\n'.join(f"y{j} :- not x{j}." for j in range(100)) + '\n' + '\n'.join(
+            f"x{i} :- not y{j}." for i in range(100) for j in rng.sample([k for k in range(100) if k != i], 2)
+        ),
+        the_answer_set=Model.of_atoms(*(f"y{i}" for i in range(100))),
+        the_atoms_to_explain=Model.of_atoms("x0"),
+    )
+    explain.prune_serialization()
+    entries = len(cache)
+    explain.compute_minimal_assumption_set(budget=0.5)
+    assert not explain.minimal_assumption_set_is_optimal()
+    assert len(cache) == entries
+    explain.compute_explanation_sequence()
+    assert len(cache) == entries + 1
+
+
+@pytest.mark.parametrize("stage", ["the_program", "process_aggregates", "prune_serialization"])
+def test_serialization_evicted_after_a_lazy_hit_is_recomputed(cache, stage):
+    program = """
+        {a}.
+        b :- a.
+        c :- b, not d.
+    """
+    answer_set = Model.of_atoms("a", "b", "c")
+    dag = Explain.the_program(program, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("c"))\
+        .explanation_dag()
+    explain = Explain.the_program(program, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("c"))
+    if stage != "the_program":
+        getattr(explain, stage)()
+    cache.clear()
+    assert explain.explanation_dag() == dag
@@ -1,8 +1,16 @@
+import asyncio
 import json
+import random
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
+import clingo
+import pytest
 from dumbo_asp.primitives.models import Model
 
 from xasp.entities import Explain
+from xasp.navigator import read_navigator_graph
 
 
 def test_xai_navigator_support():
@@ -69,3 +77,445 @@ def test_explain_aggregate_variables():
         the_atoms_to_explain=Model.of_atoms("foo(1)"),
     ).navigator_graph()
     assert 'agg1(1)\\nsupport' in json.dumps(graph)
+
+
+def test_prepared_program_can_be_explained_wrt_several_answer_sets():
+    program = """
+        {a; -a}.
+        b :- a.
+        c :- #count{X : a; X : -a} = 1, X = 1.
+    """
+    prepared = Explain.prepare_program(program)
+    for answer_set in [Model.of_atoms("a", "b", "c"), Model.of_atoms("-a", "c"), Model.empty()]:
+        explain = Explain.the_program(prepared, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("c"))
+        assert explain.asp_program == program
+        assert explain.serialization == Explain.the_program(
+            program, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("c")
+        ).serialization
+        assert explain.explanation_dag() is not None
+
+
+def test_stats_record_every_stage_and_enumeration_step():
+    explain = Explain.the_program(
+        """
+            {a; b}.
+            c :- a.
+            c :- b.
+        """,
+        the_answer_set=Model.of_atoms("a", "b", "c"),
+        the_atoms_to_explain=Model.of_atoms("c"),
+    )
+    explain.compute_minimal_assumption_set(repeat=3)
+    states = [(stats.state, stats.step) for stats in explain.stats]
+    assert states == [
+        (Explain.State.SERIALIZED, 0),
+        (Explain.State.AGGREGATE_PROCESSED, 0),
+        (Explain.State.WELL_FOUNDED_COMPUTED, 0),
+        (Explain.State.PRUNED, 0),
+        (Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED, 0),
+        (Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED, 1),
+    ]
+    assert explain.minimal_assumption_sets == 1
+    assert all(stats.wall_time >= 0 and stats.max_rss > 0 and not stats.cached for stats in explain.stats)
+    assert json.loads(json.dumps(explain.stats[0].as_dict()))["state"] == "SERIALIZED"
+
+
+def test_stage_hooks_are_called_for_every_stage():
+    calls = []
+
+    def hook(explain, stats):
+        calls.append((explain, stats.state))
+
+    Explain.add_stage_hook(hook)
+    try:
+        explain = Explain.the_program(
+            "a.",
+            the_answer_set=Model.of_atoms("a"),
+            the_atoms_to_explain=Model.of_atoms("a"),
+        )
+        explain.compute_igraph()
+    finally:
+        Explain.remove_stage_hook(hook)
+    assert [state for _, state in calls] == [stats.state for stats in explain.stats]
+    assert all(called is explain for called, _ in calls)
+    assert calls[-1][1] == Explain.State.IGRAPH_COMPUTED
+
+
+def test_stats_report_includes_clingo_statistics_of_each_encoding():
+    explain = Explain.the_program(
+        """
+            a.
+            b :- a.
+            b :- not c.
+        """,
+        the_answer_set=Model.of_atoms("a", "b"),
+        the_atoms_to_explain=Model.of_atoms("b"),
+    )
+    explain.compute_explanation_sequence(repeat=2)
+    report = json.loads(json.dumps(explain.stats_report()))
+    statistics = {(stats["state"], stats["step"]): stats["clingo_statistics"] for stats in report}
+    assert set(statistics[("SERIALIZED", 0)].keys()) == {"SERIALIZATION_ENCODING"}
+    assert statistics[("AGGREGATE_PROCESSED", 0)] == {}
+    assert statistics[("MINIMAL_ASSUMPTION_SET_COMPUTED", 0)]["MINIMAL_ASSUMPTION_SET_ENCODING"]["problem"]["lp"]\
+        ["rules"] > 0
+    assert statistics[("EXPLANATION_SEQUENCE_COMPUTED", 0)] == {}
+    assert set(statistics[("EXPLANATION_SEQUENCE_COMPUTED", 1)].keys()) == {"EXPLANATION_ENCODING",
+                                                                            "INDEXED_EXPLAIN_ENCODING"}
+
+
+def test_compute_stable_model_can_return_clingo_statistics():
+    statistics = {}
+    assert Explain.compute_stable_model("{a}. :~ a. [1@1]", statistics=statistics) == Model.empty()
+    assert statistics["summary"]["models"]["optimal"] == 1
+
+
+def test_navigator_graph_keeps_only_nodes_reachable_from_the_atoms_to_explain():
+    explain = Explain.the_program(
+        """
+            a.
+            b :- a.
+            c :- b.
+            d :- a.
+        """,
+        the_answer_set=Model.of_atoms("a", "b", "c", "d"),
+        the_atoms_to_explain=Model.of_atoms("c"),
+    )
+    dag = explain.explanation_dag()
+    graph = Explain.the_dag(
+        dag,
+        the_answer_set=Model.of_atoms("a", "b", "c", "d"),
+        the_atoms_to_explain=Model.of_atoms("b"),
+    ).navigator_graph()
+    assert sorted(node["label"].split('\n')[0] for node in graph["nodes"]) == ["a", "b"]
+    assert len(graph["links"]) == 1
+
+
+def test_layouts_are_cached_and_layered_layout_follows_the_edges():
+    explain = Explain.the_program(
+        """
+            a.
+            b :- a.
+            c :- b, not d.
+            e :- a, c.
+        """,
+        the_answer_set=Model.of_atoms("a", "b", "c", "e"),
+        the_atoms_to_explain=Model.of_atoms("e"),
+    )
+    assert explain.layout() is explain.layout(algorithm="sugiyama")
+    layered = explain.layout(algorithm="layered")
+    assert layered is explain.layout(algorithm="layered")
+    graph = explain.navigator_graph(layout_algorithm="layered")
+    for link in graph["links"]:
+        assert graph["nodes"][link["source"]]["y"] < graph["nodes"][link["target"]]["y"]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_save_navigator_graph_streams_the_navigator_graph(tmp_path, compress):
+    explain = Explain.the_program(
+        """
+            a.
+            b :- a.
+            c :- b, not d.
+        """,
+        the_answer_set=Model.of_atoms("a", "b", "c"),
+        the_atoms_to_explain=Model.of_atoms("c"),
+    )
+    target = tmp_path / "graph.jsonl"
+    explain.save_navigator_graph(target, compress=compress)
+    records = list(read_navigator_graph(target))
+    graph = explain.navigator_graph()
+    assert records[0] == {"type": "graph", "nodes": len(graph["nodes"]), "links": len(graph["links"])}
+    assert [{"type": "node", **node} for node in graph["nodes"]] + \
+           [{"type": "link", **link} for link in graph["links"]] == records[1:]
+    assert (target.read_bytes()[0] == ord('{')) != compress
+
+
+def test_navigator_server_answers_with_neighbourhoods():
+    explain = Explain.the_program(
+        """
+            a.
+            b :- a.
+            c :- b, not d.
+        """,
+        the_answer_set=Model.of_atoms("a", "b", "c"),
+        the_atoms_to_explain=Model.of_atoms("c"),
+    )
+    server = explain.serve_navigator_graph(open_browser=False)
+    try:
+        def get(path):
+            with urllib.request.urlopen(server.url + path) as response:
+                return json.loads(response.read())
+
+        graph = get("graph")
+        assert graph["nodes"] == len(explain.navigator_graph()["nodes"])
+        root = graph["roots"][0]
+        assert [node["id"] for node in get(f"neighbourhood?node={root}&depth=0")["nodes"]] == [root]
+        neighbourhood = get(f"neighbourhood?node={root}&depth=1")
+        assert {link["source"] for link in neighbourhood["links"]} == {root}
+        assert get("neighbourhood?node=c&depth=100")["links"] == explain.navigator_graph()["links"]
+        with pytest.raises(urllib.error.HTTPError):
+            get("neighbourhood?node=unknown")
+    finally:
+        server.stop()
+
+
+def test_explanation_dag_and_igraph_can_be_limited_to_a_distance():
+    program = "a(1). a(I+1) :- a(I), I < 10."
+    answer_set = Model.of_atoms(*(f"a({index})" for index in range(1, 11)))
+    explain = Explain.the_program(program, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("a(10)"))
+    explain.compute_explanation_dag(distance=2)
+    assert len(explain.explanation_dag().filter(lambda atom: atom.predicate_name == "link")) == 2
+    graph = explain.navigator_graph()
+    assert sorted(node["label"] for node in graph["nodes"]) == ["a(10)\nsupport", "a(8)\n...", "a(9)\nsupport"]
+    assert len(graph["links"]) == 2
+    with pytest.raises(ValueError):
+        explain.compute_explanation_dag(distance=3)
+
+    full = Explain.the_program(program, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("a(10)"))
+    graph = Explain.the_dag(
+        full.explanation_dag(),
+        the_answer_set=answer_set,
+        the_atoms_to_explain=Model.of_atoms("a(10)"),
+    )
+    graph.compute_igraph(distance=1)
+    assert sorted(node["label"] for node in graph.navigator_graph()["nodes"]) == ["a(10)\nsupport", "a(9)\nsupport"]
+
+
+def test_cone_of_influence_slices_the_program_before_serialization():
+    program = """
+        a(1). a(I+1) :- a(I), I < 3.
+        b(X) :- a(X), not c(X).
+        {c(X)} :- a(X), X > 5.
+        d(X) :- a(X).
+    """
+    answer_set = Model.of_atoms("a(1)", "a(2)", "a(3)", "b(1)", "b(2)", "b(3)", "d(1)", "d(2)", "d(3)")
+    full = Explain.the_program(program, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("b(3)"))
+    sliced = Explain.the_program(program, the_answer_set=answer_set, the_atoms_to_explain=Model.of_atoms("b(3)"),
+                                 cone_of_influence=True)
+    assert len(sliced.serialization) < len(full.serialization)
+    assert "d" not in {atom.arguments[1].name for atom in sliced.serialization if atom.predicate_name == "head"}
+    assert sliced.explanation_dag().filter(lambda atom: atom.predicate_name == "link") == \
+           full.explanation_dag().filter(lambda atom: atom.predicate_name == "link")
+    with pytest.raises(ValueError):
+        Explain.the_program(program, the_answer_set=answer_set, cone_of_influence=True)
+
+
+def test_serialization_is_pruned_to_atoms_that_can_explain_the_atoms_to_explain():
+    explain = Explain.the_program(
+        """
+            {a}.
+            b :- a.
+            c :- b, not d.
+            z :- not w.
+            w :- not z.
+        """,
+        the_answer_set=Model.of_atoms("a", "b", "c", "z"),
+        the_atoms_to_explain=Model.of_atoms("c"),
+    )
+    explain.compute_atoms_explained_by_initial_well_founded()
+    assert "true(z)" in [str(atom) for atom in explain.serialization]
+    explain.prune_serialization()
+    assert {str(atom.arguments[0]) for atom in explain.serialization
+            if atom.predicate_name in ["true", "false"]} == {"a", "b", "c", "d"}
+    assert explain.minimal_assumption_set() == Model.empty()
+    assert {str(atom.arguments[1]) for atom in explain.explanation_dag()
+            if atom.predicate_name == "link"} == {"a", "b", "c", "d"}
+
+
+def test_pruned_serialization_keeps_original_rules_of_false_aggregates():
+    explain = Explain.the_program(
+        """
+            {b(1)}.
+            a :- #count{X : b(X)} >= 1.
+        """,
+        the_answer_set=Model.empty(),
+        the_atoms_to_explain=Model.of_atoms("a"),
+    )
+    explain.prune_serialization()
+    assert "agg1" in [str(atom.arguments[0]) for atom in explain.serialization
+                      if atom.predicate_name == "original_rule"]
+    explain.compute_igraph()
+    assert "#count{X : b(X)} >= 1" in json.dumps(explain.navigator_graph())
+
+
+def test_encodings_do_not_report_undefined_atoms(capfd):
+    Explain.the_program(
+        """
+            {b(1)}.
+            a :- #count{X : b(X)} >= 1.
+        """,
+        the_answer_set=Model.empty(),
+        the_atoms_to_explain=Model.of_atoms("a"),
+    ).explanation_dag()
+    assert "no atoms over signature" not in capfd.readouterr().err
+
+
+def test_first_explanation_sequence_is_computed_by_forward_chaining(monkeypatch):
+    explain = Explain.the_program(
+        """
+            a.
+            b :- a.
+            b :- not c.
+        """,
+        the_answer_set=Model.of_atoms("a", "b"),
+        the_atoms_to_explain=Model.of_atoms("b"),
+    )
+    explain.compute_minimal_assumption_set()
+
+    def fail(*args, **kwargs):
+        assert False, "clingo must not be called"
+    monkeypatch.setattr(clingo, "Control", fail)
+    first = explain.explanation_sequence()
+    assert [str(atom.arguments[1]) for atom in first] in [["a", "b"], ["c", "b"]]
+
+    monkeypatch.undo()
+    explain.compute_explanation_sequence(repeat=2)
+    assert explain.explanation_sequences == 2
+    assert explain.explanation_sequence(0) == first
+    assert explain.explanation_sequence(1) != first
+
+
+def test_first_explanation_dag_is_built_without_clingo(monkeypatch):
+    explain = Explain.the_program(
+        """
+            x :- not z.
+            z :- not x.
+            b :- not x.
+            :- b.
+            y :- not w.
+            w :- not y.
+            c :- not y.
+            :- c.
+            a :- b, c.
+        """,
+        the_answer_set=Model.of_atoms("x", "y"),
+        the_atoms_to_explain=Model.of_atoms("a"),
+    )
+    explain.compute_explanation_sequence()
+
+    def fail(*args, **kwargs):
+        assert False, "clingo must not be called"
+    monkeypatch.setattr(clingo, "Control", fail)
+    first = explain.explanation_dag()
+    sequence = {str(atom.arguments[1]): atom.arguments[0].number for atom in explain.explanation_sequence()}
+    witness = min(["b", "c"], key=sequence.get)
+    assert [str(atom.arguments[3]) for atom in first if atom.predicate_name == "link" and
+            str(atom.arguments[1]) == "a"] == [witness]
+
+    monkeypatch.undo()
+    explain.compute_explanation_dag()
+    assert explain.explanation_dags == 2
+    assert explain.explanation_dag(0) == first
+    assert explain.explanation_dag(1) != first
+
+
+def test_alternative_dags_of_a_sequence_are_enumerated_by_a_single_control(monkeypatch):
+    explain = Explain.the_program(
+        '\n'.join(f"b{i} :- not x{i}. x{i} :- not z{i}. z{i} :- not x{i}. :- b{i}." for i in range(3)) +
+        "a :- b0, b1, b2.",
+        the_answer_set=Model.of_atoms("x0", "x1", "x2"),
+        the_atoms_to_explain=Model.of_atoms("a"),
+    )
+    explain.compute_explanation_dag()
+    controls = []
+    control = clingo.Control
+    monkeypatch.setattr(clingo, "Control",
+                        lambda *args, **kwargs: controls.append(control(*args, **kwargs)) or controls[-1])
+    explain.compute_explanation_dag(repeat=2)
+    assert len(controls) == 1
+    assert len({str(explain.explanation_dag(index)) for index in range(explain.explanation_dags)}) == 3
+
+
+def test_an_instance_can_be_shared_among_threads():
+    explain = Explain.the_program(
+        '\n'.join(f"b{i} :- not x{i}. x{i} :- not z{i}. z{i} :- not x{i}. :- b{i}." for i in range(3)) +
+        "a :- b0, b1, b2.",
+        the_answer_set=Model.of_atoms("x0", "x1", "x2"),
+        the_atoms_to_explain=Model.of_atoms("a"),
+    )
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: explain.compute_explanation_dag(), range(4)))
+    assert explain.explanation_dags == 4
+    assert len({str(explain.explanation_dag(index)) for index in range(explain.explanation_dags)}) == 4
+
+
+def test_explanations_can_be_computed_concurrently_on_the_running_loop():
+    def explain(atom):
+        return Explain.the_program(
+            "{a; b}. c :- a. d :- b, not c.",
+            the_answer_set=Model.of_atoms("b", "d"),
+            the_atoms_to_explain=Model.of_atoms(atom),
+        )
+
+    async def main():
+        explains = [explain("b"), explain("d")]
+        await asyncio.gather(*(explain.acompute_explanation_dag() for explain in explains))
+        return explains
+
+    assert [explain.explanation_dag() for explain in asyncio.run(main())] == \
+        [explain(atom).explanation_dag() for atom in ["b", "d"]]
+
+
+def test_cancelling_an_async_computation_interrupts_it():
+    explain = Explain.the_program(
+        '\n'.join(f"b{i} :- not x{i}. x{i} :- not z{i}. z{i} :- not x{i}. :- b{i}." for i in range(100)) +
+        f"a :- {', '.join(f'b{i}' for i in range(100))}.",
+        the_answer_set=Model.of_atoms(*(f"x{i}" for i in range(100))),
+        the_atoms_to_explain=Model.of_atoms("a"),
+    )
+
+    async def main():
+        task = asyncio.create_task(explain.acompute_explanation_dag(repeat=100))
+        while explain.explanation_dags < 2:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        dags = explain.explanation_dags
+        await explain.acompute_explanation_dag()
+        return dags
+
+    dags = asyncio.run(main())
+    assert dags < 100
+    assert explain.explanation_dags == dags + 1
+    assert len({str(explain.explanation_dag(index)) for index in range(explain.explanation_dags)}) == dags + 1
+
+
+def feedback_vertex_set(nodes: int) -> Explain:
+    """Explaining all x atoms requires assuming a minimum feedback vertex set of a random graph (hard for 100 nodes)."""
+    rng = random.Random(0)
+    return Explain.the_program(
+        '\n'.join(f"y{j} :- not x{j}." for j in range(nodes)) + '\n' + '\n'.join(
+            f"x{i} :- not y{j}." for i in range(nodes) for j in rng.sample([k for k in range(nodes) if k != i], 2)
+        ),
+        the_answer_set=Model.of_atoms(*(f"y{i}" for i in range(nodes))),
+        the_atoms_to_explain=Model.of_atoms("x0"),
+    )
+
+
+def test_budget_of_minimal_assumption_set_returns_the_best_one_found():
+    explain = feedback_vertex_set(100)
+    explain.compute_minimal_assumption_set(budget=0.5)
+    assert not explain.minimal_assumption_set_is_optimal()
+    assert not explain.stats[-1].optimal
+    assert len(explain.minimal_assumption_set()) > 0
+    explain.compute_explanation_dag(budget=0.5)
+    assert explain.explanation_dags == 1
+    assert explain.minimal_assumption_sets == 1
+
+
+def test_cpu_time_of_a_stage_includes_solving():
+    explain = feedback_vertex_set(100)
+    explain.compute_minimal_assumption_set(budget=0.5)
+    assert explain.stats[-1].cpu_time > 0.25
+
+
+def test_budget_expired_before_any_model_raises_interrupted():
+    explain = feedback_vertex_set(100)
+    with pytest.raises(Explain.Interrupted):
+        explain.compute_minimal_assumption_set(budget=0)
+    assert explain.minimal_assumption_sets == 0
+    small = feedback_vertex_set(30)
+    small.compute_minimal_assumption_set(budget=60)
+    assert small.minimal_assumption_set_is_optimal()
+    assert small.stats[-1].optimal
@@ -0,0 +1,39 @@
+import pytest
+from dumbo_asp.primitives.models import Model
+
+from xasp.entities import Explain
+from xasp.parallel import Job, explain_all
+
+
+@pytest.mark.parametrize("threads", [False, True])
+def test_explain_all_computes_the_dag_of_each_job(threads):
+    program = """
+        {a; b}.
+        c :- a.
+        d :- b, not c.
+    """
+    jobs = [
+        Job(program, Model.of_atoms("a", "c"), Model.of_atoms("c")),
+        Job(program, Model.of_atoms("b", "d"), Model.of_atoms("d")),
+        Job("x :- y.", Model.empty(), Model.of_atoms("x")),
+        Job(program, Model.of_atoms("a", "c"), Model.of_atoms("d")),
+    ]
+    results = sorted(explain_all(iter(jobs), workers=2, pending=1, threads=threads), key=lambda result: result.index)
+    assert [result.job for result in results] == jobs
+    for result in results:
+        assert result.error is None
+        assert result.dag == Explain.the_program(
+            result.job.program,
+            the_answer_set=result.job.answer_set,
+            the_atoms_to_explain=result.job.atoms_to_explain,
+        ).explanation_dag()
+
+
+@pytest.mark.parametrize("threads", [False, True])
+def test_explain_all_reports_errors_of_single_jobs(threads):
+    results = list(explain_all([
+        Job("a.", Model.of_atoms("a"), Model.of_atoms("a")),
+        Job("a :- b.", Model.of_atoms("a"), Model.of_atoms("a")),
+    ], workers=1, threads=threads))
+    assert len(results) == 2
+    assert [result.error is None for result in sorted(results, key=lambda result: result.index)] == [True, False]
@@ -6,7 +6,10 @@ from dumbo_asp.primitives.models import Model
 from dumbo_asp.primitives.predicates import Predicate
 from xasp.queries import compute_stable_model, compute_minimal_assumption_set, \
     compute_explanation, compute_explanation_dag, compute_serialization, compute_minimal_assumption_sets, \
-    compute_explanations, compute_explanation_dags, compute_atoms_explained_by_initial_well_founded
+    compute_explanations, compute_explanation_dags, compute_atoms_explained_by_initial_well_founded, process_aggregates, \
+    compute_explanation_dags_for
+from xasp.contexts import ProcessAggregatesContext
+from xasp.entities import Explain, PROCESS_AGGREGATES_ENCODING
 
 logging.getLogger().setLevel(logging.DEBUG)
 
@@ -324,6 +327,19 @@ def test_compute_dags():
     assert len(compute_explanation_dags(serialization, Model.of_atoms("c"))) == 2
 
 
+def test_dags_differing_only_in_leaves_are_blocked():
+    serialization = compute_serialization(
+        """
+            {a; b; c} <= 2.
+            a.
+            b.
+        """,
+        answer_set=Model.of_atoms("a", "b"),
+        atoms_to_explain=Model.of_atoms("c")
+    )
+    assert len(compute_explanation_dags(serialization, Model.of_atoms("c"), up_to=30)) == 1
+
+
 def test_choice_rule_with_condition_arithmetic():
     serialization = compute_serialization(
         """
@@ -415,3 +431,83 @@ def test_minimal_assumption_set_block_up_must_take_into_account_weights():
     for s in sets: print(s.as_facts ,'-')
     assert "c." not in sets[0].as_facts
     assert len(sets) == 1
+
+
+def test_compute_well_founded_with_positive_cycle_and_long_chain():
+    serialization = compute_serialization("""
+        a :- b.
+        b :- a.
+        c :- not a.
+        p(0).
+        p(X+1) :- p(X), X < 20.
+        d :- p(0), p(5), p(10), p(20), not a.
+        e :- p(21).
+    """, answer_set=Model.of_atoms("c d".split() + [f"p({x})" for x in range(21)]),
+                                          additional_atoms_in_base=Model.of_atoms("a b e".split()))
+    well_founded = compute_atoms_explained_by_initial_well_founded(serialization)
+    assert compute_stable_model("""
+        explained_by(a,initial_well_founded).
+        explained_by(b,initial_well_founded).
+        explained_by(e,initial_well_founded).
+    """) == well_founded
+
+
+def test_compute_minimal_assumption_sets_incrementally():
+    serialization = compute_serialization(
+        """
+            a :- not b.
+            b :- not a.
+            a :- not c.
+            c :- not a.
+            a :- not d.
+            d :- not a.
+        """,
+        answer_set=Model.of_atoms("a"),
+        additional_atoms_in_base=Model.of_atoms("b", "c", "d"),
+        atoms_to_explain=Model.of_atoms("a")
+    )
+    minimal_assumption_sets = compute_minimal_assumption_sets(serialization, atoms_to_explain=Model.of_atoms("a"))
+    assert sorted(str(minimal_assumption_set) for minimal_assumption_set in minimal_assumption_sets) == [
+        "assume_false(b)", "assume_false(c)", "assume_false(d)",
+    ]
+    assert len(compute_minimal_assumption_sets(serialization, Model.of_atoms("a"), up_to=2)) == 2
+
+
+def test_process_aggregates_coincides_with_the_encoding():
+    serialization = compute_serialization("""
+        {p(1..4)}.
+        a :- #sum{X : p(X)} >= 5.
+        b :- #count{X : p(X)} = 2.
+        c :- #min{X : p(X)} < 2.
+        d :- #max{X : p(X)} != 4.
+        e :- 1 < #sum{X,x : p(X); X,y : p(X)} <= 8, #count{X : p(X)} > 10.
+        f :- #min{X : q(X)} > 0.
+        g :- #max{X : q(X)} < 0.
+    """, answer_set=Model.of_atoms("p(1)", "p(3)", "a", "b", "c", "d", "f", "g"),
+        additional_atoms_in_base=Model.of_atoms("p(2)", "p(4)", "e", "q(1)"))
+    assert process_aggregates(serialization) == Explain.compute_stable_model(
+        PROCESS_AGGREGATES_ENCODING + serialization.as_facts,
+        context=ProcessAggregatesContext(),
+    ).drop(Predicate.parse("original_rule"))
+
+
+def test_compute_explanation_dags_for_many_atoms_shares_the_serialization():
+    program = """
+        {a; b}.
+        c :- a.
+        d :- b, not c.
+        e :- not d.
+    """
+    answer_set = Model.of_atoms("a", "c", "e")
+    atoms = Model.of_atoms("c", "d", "e")
+    results = compute_explanation_dags_for(program, answer_set, atoms)
+    assert not isinstance(results, tuple)
+    dags = dict((str(atom), dag) for atom, dag in results)
+    assert list(dags.keys()) == ["c", "d", "e"]
+    for atom in atoms:
+        assert dags[str(atom)] == Explain.the_program(
+            program,
+            the_answer_set=answer_set,
+            the_atoms_to_explain=Model.of_atoms(atom),
+            the_additional_atoms_in_the_base=atoms,
+        ).explanation_dag()
@@ -4,7 +4,7 @@ from typing import Optional
 
 import pytest
 
-from xasp.transformers import ProgramSerializerTransformer
+from xasp.transformers import ProgramSerializerTransformer, ConeOfInfluenceTransformer
 
 logging.getLogger().setLevel(logging.DEBUG)
 
@@ -296,3 +296,22 @@ def test_transform_const_directive(program_serializer_transformer):
     assert equals(program_serializer_transformer.apply("#const foo = bar."), """
         #const foo = bar.
     """)
+
+
+def test_cone_of_influence_keeps_rules_and_constraints_reaching_the_predicates():
+    transformer = ConeOfInfluenceTransformer([("a", 1)])
+    assert transformer.apply("""
+#const n=3.
+a(X) :- b(X), not -c(X), #count{Y : d(Y)} > 1.
+{e(1); f} = 1 :- g.
+:- a(1), h.
+-c(1).
+c(X) :- k(X).
+z :- w.
+:- z.
+""") == """#const n=3.
+a(X) :- b(X), not -c(X), #count{Y : d(Y)} > 1.
+:- a(1), h.
+-c(1).
+c(X) :- k(X)."""
+    assert transformer.cone == {("a", 1), ("b", 1), ("c", 1), ("d", 1), ("h", 0), ("k", 1)}
@@ -0,0 +1,155 @@
+import abc
+import dataclasses
+import hashlib
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Final, Optional
+
+import clingo
+import typeguard
+from dumbo_asp.primitives.models import Model
+from valid8 import validate
+
+CACHE_VERSION: Final = 1
+"""
+Part of every key. Bump it whenever the output of a stage may change for the same input.
+"""
+
+
+@typeguard.typechecked
+class Cache(abc.ABC):
+    """
+    Outputs of the stages of Explain, addressed by a digest of their inputs.
+    A stored None means that the stage has no output for those inputs (e.g., no more minimal assumption sets).
+    Missing keys raise KeyError.
+    """
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        digest = hashlib.sha256(str(CACHE_VERSION).encode())
+        for part in parts:
+            encoded = part.encode()
+            digest.update(len(encoded).to_bytes(8, "little"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    @staticmethod
+    def digest_of(model: Optional[Model]) -> str:
+        if model is None:
+            return "None"
+        return Cache.key(*sorted(str(element) for element in model))
+
+    @abc.abstractmethod
+    def __getitem__(self, key: str) -> Optional[Model]:
+        ...
+
+    @abc.abstractmethod
+    def __setitem__(self, key: str, value: Optional[Model]) -> None:
+        ...
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+            return True
+        except KeyError:
+            return False
+
+
+@typeguard.typechecked
+@dataclasses.dataclass(frozen=True)
+class DirectoryCache(Cache):
+    """
+    One zlib-compressed file per entry in a local directory.
+    Reading an entry refreshes its modification time, and the least recently used entries are evicted as soon as
+    the directory exceeds max_size bytes.
+    """
+    path: Path
+    max_size: int = 256 * 1024 * 1024
+
+    SUFFIX = ".zlib"
+    NO_MODEL = b"#none"
+
+    def __post_init__(self):
+        validate("max_size", self.max_size, min_value=1)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def __file(self, key: str) -> Path:
+        return self.path / f"{key}{self.SUFFIX}"
+
+    def __getitem__(self, key: str) -> Optional[Model]:
+        file = self.__file(key)
+        try:
+            content = zlib.decompress(file.read_bytes())
+        except (FileNotFoundError, zlib.error):
+            raise KeyError(key)
+        try:
+            os.utime(file)
+        except FileNotFoundError:
+            pass
+        if content == self.NO_MODEL:
+            return None
+        return Model.of_atoms(*(clingo.parse_term(atom) for atom in content.decode().split('\n') if atom),
+                              sort=False)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            os.utime(self.__file(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def __setitem__(self, key: str, value: Optional[Model]) -> None:
+        content = self.NO_MODEL if value is None else '\n'.join(str(atom) for atom in value).encode()
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix=".tmp", delete=False) as file:
+            file.write(zlib.compress(content))
+        os.replace(file.name, self.__file(key))
+        self.__evict()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.path.glob(f"*{self.SUFFIX}"))
+
+    @property
+    def size(self) -> int:
+        return sum(stat.st_size for _, stat in self.__entries())
+
+    def clear(self) -> None:
+        for file, _ in self.__entries():
+            file.unlink(missing_ok=True)
+
+    def __entries(self) -> list[tuple[Path, os.stat_result]]:
+        res = []
+        for file in self.path.glob(f"*{self.SUFFIX}"):
+            try:
+                res.append((file, file.stat()))
+            except FileNotFoundError:
+                pass
+        return res
+
+    def __evict(self) -> None:
+        entries = self.__entries()
+        size = sum(stat.st_size for _, stat in entries)
+        entries.sort(key=lambda entry: entry[1].st_mtime_ns)
+        for file, stat in entries:
+            if size <= self.max_size:
+                break
+            file.unlink(missing_ok=True)
+            size -= stat.st_size
+
+
+__default_cache: Optional[Cache] = None
+
+
+@typeguard.typechecked
+def set_default_cache(cache: Optional[Cache]) -> None:
+    """
+    Set the cache used by all Explain instances created afterwards (None disables caching).
+    """
+    global __default_cache
+    __default_cache = cache
+
+
+@typeguard.typechecked
+def default_cache() -> Optional[Cache]:
+    return __default_cache
@@ -12,5 +12,5 @@ def save_explanation_dag(dag: Model, answer_set: Model, atoms_to_explain: Model,
         dag,
         the_answer_set=answer_set,
         the_atoms_to_explain=atoms_to_explain,
-    ).save_igraph(target, distance, **kwargs)
+    ).save_igraph(target, distance=distance, **kwargs)
 
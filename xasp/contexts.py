@@ -1,33 +1,118 @@
 import dataclasses
-from collections import defaultdict, namedtuple
+from collections import defaultdict, deque, namedtuple
 from functools import cached_property
+from typing import Final, Optional
 
 import typeguard
-from clingo import Number
+from clingo import Number, Symbol, SymbolType, Function, Tuple_, Supremum, Infimum, String
+from dumbo_asp.primitives.models import Model
 
 from dumbo_utils.console import log
 
 
+PROCESS_AGGREGATES_VERSION: Final = 1
+"""
+Version of the aggregates processed in Python, part of the cache keys (see xasp.entities.ENCODING_VERSION).
+Bump it whenever the output of ProcessAggregatesContext may change for the same input.
+"""
+
+
 @typeguard.typechecked
 class ProcessAggregatesContext:
+    SHOWN_PREDICATES: Final = {
+        ("rule", 1), ("original_rule", 3), ("choice", 3), ("head", 2), ("pos_body", 2), ("neg_body", 2),
+        ("true", 1), ("false", 1), ("explain", 1),
+    }
+
     @staticmethod
     def check_operator(operator, bounds, value):
-        if operator.string in ["=", "=="]:
-            return Number(1) if value == bounds else Number(0)
-        if operator.string in ["!=", "<>"]:
-            return Number(1) if value != bounds else Number(0)
-        if operator.string == "<":
-            return Number(1) if value < bounds else Number(0)
-        if operator.string == ">":
-            return Number(1) if value > bounds else Number(0)
-        if operator.string == "<=":
-            return Number(1) if value <= bounds else Number(0)
-        if operator.string == ">=":
-            return Number(1) if value >= bounds else Number(0)
-        if operator.string == "in":
-            return Number(1) if bounds.arguments[0] <= value <= bounds.arguments[1] else Number(0)
+        return Number(1) if ProcessAggregatesContext.holds(operator.string, bounds, value) else Number(0)
+
+    @staticmethod
+    def holds(operator: str, bounds: Symbol, value: Symbol) -> bool:
+        if operator in ["=", "=="]:
+            return value == bounds
+        if operator in ["!=", "<>"]:
+            return value != bounds
+        if operator == "<":
+            return value < bounds
+        if operator == ">":
+            return value > bounds
+        if operator == "<=":
+            return value <= bounds
+        if operator == ">=":
+            return value >= bounds
+        if operator == "in":
+            return bounds.arguments[0] <= value <= bounds.arguments[1]
+        assert False
+
+    @staticmethod
+    def aggregate_value(function: str, elements: set) -> Symbol:
+        if function == "sum":
+            return Number(sum(weight.number for weight, terms in elements if weight.type == SymbolType.Number))
+        if function == "count":
+            return Number(len(elements))
+        if function == "min":
+            return min((weight for weight, terms in elements), default=Supremum)
+        if function == "max":
+            return max((weight for weight, terms in elements), default=Infimum)
         assert False
 
+    def process_aggregates(self, serialization: Model) -> Model:
+        """
+        Same as grounding PROCESS_AGGREGATES_ENCODING with the serialization, but evaluated in Python.
+        The returned model is not sorted.
+        """
+        aggregates = defaultdict(list)
+        agg_sets = defaultdict(list)
+        true, false = set(), set()
+        res = []
+        for atom in serialization:
+            symbol = atom.value
+            predicate = (symbol.name, len(symbol.arguments))
+            if predicate == ("aggregate", 4):
+                aggregates[symbol.arguments[0]].append(symbol.arguments[1:])
+            elif predicate == ("agg_set", 4):
+                agg_sets[symbol.arguments[0]].append(symbol.arguments[1:])
+            elif predicate in self.SHOWN_PREDICATES:
+                if predicate == ("true", 1):
+                    true.add(symbol.arguments[0])
+                elif predicate == ("false", 1):
+                    false.add(symbol.arguments[0])
+                res.append(symbol)
+
+        for aggregate, definitions in aggregates.items():
+            res.append(Function("aggregate", [aggregate]))
+            elements = {(weight, terms) for atom, weight, terms in agg_sets[aggregate] if atom in true}
+            if any(self.holds(operator.string, bounds, self.aggregate_value(function.name, elements))
+                   for function, operator, bounds in definitions):
+                res.append(Function("true", [aggregate]))
+                res.append(Function("rule", [aggregate]))
+                res.append(Function("head", [aggregate, aggregate]))
+                for atom, weight, terms in agg_sets[aggregate]:
+                    if atom in true:
+                        res.append(Function("pos_body", [aggregate, atom]))
+                    if atom in false:
+                        res.append(Function("neg_body", [aggregate, atom]))
+            else:
+                res.append(Function("false", [aggregate]))
+                for atom, weight, terms in agg_sets[aggregate]:
+                    rule = Tuple_([aggregate, atom])
+                    res.append(Function("rule", [rule]))
+                    res.append(Function("head", [rule, aggregate]))
+                    if atom in false:
+                        res.append(Function("pos_body", [rule, atom]))
+                    if atom in true:
+                        res.append(Function("neg_body", [rule, atom]))
+        return Model.of_atoms(*dict.fromkeys(res), sort=False)
+
+
+WELL_FOUNDED_VERSION: Final = 1
+"""
+Version of the well-founded model computed in Python, part of the cache keys (see xasp.entities.ENCODING_VERSION).
+Bump it whenever the output of ComputeWellFoundedContext may change for the same input.
+"""
+
 
 @typeguard.typechecked
 @dataclasses.dataclass(frozen=True)
@@ -40,6 +125,22 @@ class ComputeWellFoundedContext:
     atom2pos_bodies: dict = dataclasses.field(default_factory=lambda: defaultdict(list))
     atom2neg_bodies: dict = dataclasses.field(default_factory=lambda: defaultdict(list))
 
+    @staticmethod
+    def of_serialization(serialization: Model) -> "ComputeWellFoundedContext":
+        """
+        Collect the rules of the serialization in bulk, i.e., without grounding WELL_FOUNDED_ENCODING.
+        """
+        res = ComputeWellFoundedContext()
+        atoms = [(atom.value.name, atom.value.arguments) for atom in serialization]
+        for name, arguments in atoms:
+            if name == "rule" and len(arguments) == 1:
+                res.collect_rule(arguments[0])
+        collect = {"head": res.collect_head, "pos_body": res.collect_pos_body, "neg_body": res.collect_neg_body}
+        for name, arguments in atoms:
+            if name in collect and len(arguments) == 2:
+                collect[name](*arguments)
+        return res
+
     def collect_rule(self, rule):
         assert rule not in self.rules.keys()
         self.rules[rule] = self.Rule(rule, set(), set(), set())
@@ -72,77 +173,452 @@ class ComputeWellFoundedContext:
     @cached_property
     def well_founded_model(self) -> 'ComputeWellFoundedContext.WellFoundedModel':
         log.debug("Compute well-founded model: begin")
-        well_founded_model = self.WellFoundedModel(
-            set(),
-            set().union(*(rule.head for rule in self.rules.values() if rule.head))
-        )
-        source_pointer = {atom: None for atom in well_founded_model.potentially_true}
-
-        while True:
-            queue = list(set().union(*(rule.head for rule in self.rules.values() if
-                                       len(rule.pos_body) + len(rule.neg_body) == 0 and rule.head)))
-            while queue:
-                true_atom = queue[-1]
-                queue.pop()
-
-                if true_atom in well_founded_model.true:
-                    continue
-                assert true_atom in well_founded_model.potentially_true
-
-                well_founded_model.true.add(true_atom)
-                log.debug(f"founded: {true_atom}")
-                for rule in self.atom2pos_bodies[true_atom]:
-                    if all(atom in well_founded_model.true for atom in rule.pos_body) and \
-                            all(atom not in well_founded_model.potentially_true for atom in rule.neg_body):
-                        for head_atom in rule.head:
-                            queue.append(head_atom)
-
-            queue = []
-            for rule in self.rules.values():
-                self.enqueue_if_source_pointer(rule, queue, source_pointer, well_founded_model)
-            while queue:
-                atom_with_source_pointer = queue[-1]
-                queue.pop()
-
-                for rule in self.atom2pos_bodies[atom_with_source_pointer]:
-                    self.enqueue_if_source_pointer(rule, queue, source_pointer, well_founded_model)
-            founded_atoms = set(atom for atom in source_pointer if source_pointer[atom] is not None)
-            unfounded_atoms = well_founded_model.potentially_true - founded_atoms
-            if not unfounded_atoms:
-                break
-
-            for unfounded_atom in unfounded_atoms:
-                log.debug(f"unfounded: {unfounded_atom}")
-                assert unfounded_atom not in well_founded_model.true
-                well_founded_model.potentially_true.remove(unfounded_atom)
+        heads = set().union(*(rule.head for rule in self.rules.values()))
+        true = self.__compute_true_atoms(heads)
+        founded = self.__compute_founded_atoms(heads, true)
+        assert true.issubset(founded)
         log.debug("Compute well-founded model: end")
-        return well_founded_model
+        return self.WellFoundedModel(true, founded)
 
-    @staticmethod
-    def enqueue_if_source_pointer(rule, my_queue, source_pointer, well_founded_model):
-        if rule.head is None:
-            return
-        if all(source_pointer[head_atom] is not None for head_atom in rule.head):
-            return
-        log.debug(f"check {rule.id}")
-        if any(atom not in well_founded_model.potentially_true for atom in rule.pos_body):
-            return
-        log.debug(f"  pos_body potentially true")
-        if any(atom in well_founded_model.true for atom in rule.neg_body):
-            return
-        log.debug(f"  neg_body potentially true")
-        if all(source_pointer[atom] is not None for atom in rule.pos_body):
+    def __compute_true_atoms(self, heads: set) -> set:
+        # Dowling-Gallier: each rule keeps the number of positive body atoms not yet derived.
+        # Negative literals are evaluated against the head atoms (i.e., atoms that are potentially true),
+        # and only facts start the propagation.
+        missing = {id(rule): len(rule.pos_body) for rule in self.rules.values()}
+        enabled = {id(rule): not any(atom in heads for atom in rule.neg_body) for rule in self.rules.values()}
+        queue = [atom for rule in self.rules.values() if not rule.pos_body and not rule.neg_body
+                 for atom in rule.head]
+        true = set()
+        while queue:
+            true_atom = queue.pop()
+            if true_atom in true:
+                continue
+            true.add(true_atom)
+            for rule in self.atom2pos_bodies[true_atom]:
+                missing[id(rule)] -= 1
+                if missing[id(rule)] == 0 and enabled[id(rule)]:
+                    queue.extend(rule.head)
+        return true
+
+    def __compute_founded_atoms(self, heads: set, true: set) -> set:
+        # watched source pointers: each rule keeps the number of positive body atoms without a source pointer,
+        # and is discarded if its body contains atoms that cannot be true
+        source_pointer = {}
+        missing = {id(rule): len(rule.pos_body) for rule in self.rules.values()}
+        enabled = {
+            id(rule): all(atom in heads for atom in rule.pos_body) and not any(atom in true for atom in rule.neg_body)
+            for rule in self.rules.values()
+        }
+
+        def assign_source_pointer(rule, queue):
             for head_atom in rule.head:
-                if source_pointer[head_atom] is None:
-                    log.debug(f"source pointer: {head_atom} {rule.id}")
+                if head_atom not in source_pointer:
                     source_pointer[head_atom] = rule
-                    my_queue.append(head_atom)
+                    queue.append(head_atom)
+
+        queue = []
+        for rule in self.rules.values():
+            if missing[id(rule)] == 0 and enabled[id(rule)]:
+                assign_source_pointer(rule, queue)
+        while queue:
+            atom_with_source_pointer = queue.pop()
+            for rule in self.atom2pos_bodies[atom_with_source_pointer]:
+                missing[id(rule)] -= 1
+                if missing[id(rule)] == 0 and enabled[id(rule)]:
+                    assign_source_pointer(rule, queue)
+        return set(source_pointer.keys())
+
 
+EXPLANATION_VERSION: Final = 1
+"""
+Version of the explanation sequences (forward chaining, indexing and relevance) and DAGs computed in Python, part of the cache keys (see xasp.entities.ENCODING_VERSION).
+Bump it whenever the output of ComputeExplanationContext may change for the same input.
+"""
 
+
+@typeguard.typechecked
 @dataclasses.dataclass(frozen=True)
 class ComputeExplanationContext:
-    __index: list[int] = dataclasses.field(default_factory=lambda: [0], init=False)
+    """
+    Not modified after of_serialization() (lookups do not add keys to the indices), hence it can be shared among
+    threads.
+    """
+    Rule = namedtuple("Rule", "id head pos_body neg_body")
+
+    rules: dict = dataclasses.field(default_factory=dict)
+    choices: dict = dataclasses.field(default_factory=dict)
+    true: set = dataclasses.field(default_factory=set)
+    false: set = dataclasses.field(default_factory=set)
+    explain: set = dataclasses.field(default_factory=set)
+    aggregates: set = dataclasses.field(default_factory=set)
+    original_rules: list = dataclasses.field(default_factory=list)
+    atom2heads: dict = dataclasses.field(default_factory=lambda: defaultdict(list))
+    atom2bodies: dict = dataclasses.field(default_factory=lambda: defaultdict(list))
+
+    @staticmethod
+    def of_serialization(serialization: Model) -> "ComputeExplanationContext":
+        res = ComputeExplanationContext()
+        atoms = [(atom.value.name, atom.value.arguments) for atom in serialization]
+        for name, arguments in atoms:
+            if name == "rule" and len(arguments) == 1:
+                res.rules[arguments[0]] = ComputeExplanationContext.Rule(arguments[0], [], [], [])
+        for name, arguments in atoms:
+            if name in ["head", "pos_body", "neg_body"] and len(arguments) == 2:
+                rule, head_or_body_atom = arguments
+                getattr(res.rules[rule], name).append(head_or_body_atom)
+                if name == "head":
+                    res.atom2heads[head_or_body_atom].append(res.rules[rule])
+                else:
+                    res.atom2bodies[head_or_body_atom].append((res.rules[rule], name == "pos_body"))
+            elif name in ["true", "false", "explain"] and len(arguments) == 1:
+                getattr(res, name).add(arguments[0])
+            elif name == "aggregate" and len(arguments) == 1:
+                res.aggregates.add(arguments[0])
+            elif name == "choice" and len(arguments) == 3:
+                res.choices[arguments[0]] = (arguments[1], arguments[2])
+            elif name == "original_rule" and len(arguments) == 3:
+                res.original_rules.append(Function(name, arguments))
+        return res
+
+    def explanation_dag(self, explanation_sequence: Model, max_distance: Optional[int] = None) -> Optional[Model]:
+        """
+        Same as solving EXPLANATION_DAG_ENCODING for the first time, but in Python: all links are functional except
+        for the body literal linked by each rule of an atom explained by lack of support, for which the literal
+        explained first is chosen.
+        Return None if some rule has no such literal. The returned model is not sorted.
+        """
+        sequence = [tuple(atom.value.arguments) for atom in explanation_sequence]
+        index_of = {atom: index.number for index, atom, reason in sequence}
+        if max_distance is not None:
+            distance = self.__distances(dict((atom, reason) for index, atom, reason in sequence), max_distance)
+            sequence = [(index, atom, reason) for index, atom, reason in sequence
+                        if distance.get(atom, max_distance) < max_distance]
+
+        res = []
+        for index, atom, reason in sequence:
+            links = []
+            if reason.name == "lack_of_support":
+                for rule in self.atom2heads.get(atom, ()):
+                    candidates = [body_atom for body_atom in rule.pos_body if body_atom in self.false] + \
+                        [body_atom for body_atom in rule.neg_body if body_atom in self.true]
+                    candidates = [body_atom for body_atom in candidates
+                                  if body_atom in index_of and index_of[body_atom] < index.number]
+                    if not candidates:
+                        return None
+                    links.append((Tuple_([reason, rule.id]), min(candidates, key=index_of.get)))
+            elif reason.name == "":
+                kind, rule = reason.arguments[0].name, self.rules[reason.arguments[1]]
+                if kind == "required_to_falsify_body":
+                    links.extend((reason, head_atom) for head_atom in rule.head)
+                elif kind == "choice_rule":
+                    links.extend((reason, head_atom) for head_atom in rule.head if head_atom in self.true)
+                links.extend((reason, body_atom) for body_atom in rule.pos_body
+                             if kind != "required_to_falsify_body" or body_atom != atom)
+                links.extend((reason, body_atom) for body_atom in rule.neg_body)
+            res.extend(Function("link", [index, atom, link_reason, sink])
+                       for link_reason, sink in dict.fromkeys(links))
+            if links:
+                continue
+            if atom in self.true:
+                res.append(Function("link", [index, atom, reason, String("true")]))
+                if reason.name == "" and reason.arguments[0].name == "support" and \
+                        reason.arguments[1] in self.choices:
+                    res.append(Function("link", [index, atom, reason, String("#true")]))
+            elif atom in self.false:
+                res.append(Function("link", [index, atom, reason, String("false")]))
+        res.extend(self.original_rules)
+        return Model.of_atoms(*res, sort=False)
+
+    def __distances(self, reason_of: dict, max_distance: int) -> dict:
+        # as reached/2 in EXPLANATION_DAG_ENCODING, on the links that can be chosen
+        res = {atom: 0 for atom in self.explain}
+        queue = deque(self.explain)
+        while queue:
+            atom = queue.popleft()
+            if res[atom] >= max_distance or atom not in reason_of:
+                continue
+            reason = reason_of[atom]
+            if reason.name == "lack_of_support":
+                rules = self.atom2heads.get(atom, ())
+            elif reason.name == "":
+                rules = [self.rules[reason.arguments[1]]]
+            else:
+                rules = []
+            for rule in rules:
+                linked = rule.pos_body + rule.neg_body
+                if reason.name == "" and reason.arguments[0].name != "support":
+                    linked = linked + rule.head
+                for linked_atom in linked:
+                    if linked_atom not in res:
+                        res[linked_atom] = res[atom] + 1
+                        queue.append(linked_atom)
+        return res
+
+    def explanation_sequence(self, assumption_set: Model, explained_by_initial_well_founded: Model) \
+            -> Optional[list[tuple[Symbol, Symbol]]]:
+        """
+        Same as solving EXPLANATION_ENCODING and INDEXED_EXPLAIN_ENCODING for the first time, but by forward chaining
+        in Python: once the assumption set is fixed, the reasons of EXPLAIN_ENCODING only depend monotonically on
+        explained atoms, so each rule keeps the number of its true literals (and heads) not yet explained, and each
+        false atom the number of its rules without an explained false body literal.
+        Return the explained atoms in the order of their explanation, or None if some atom cannot be explained.
+        """
+        res = {}
+        queue = []
+        missing_true_literals = {
+            rule.id: sum(1 for atom in rule.pos_body if atom in self.true) +
+            sum(1 for atom in rule.neg_body if atom in self.false)
+            for rule in self.rules.values()
+        }
+        missing_heads = {rule.id: len(rule.head) for rule in self.rules.values()}
+        explained_true_heads = {rule.id: 0 for rule in self.rules.values()}
+        false_body = set()
+        rules_without_false_body = {atom: len(self.atom2heads.get(atom, ())) for atom in self.false}
+        true_body = {
+            rule.id for rule in self.rules.values()
+            if all(atom in self.true for atom in rule.pos_body) and all(atom in self.false for atom in rule.neg_body)
+        }
+        required_to_falsify = {}
+        for rule in self.rules.values():
+            false_literals = [atom for atom in rule.pos_body if atom not in self.true] + \
+                [atom for atom in rule.neg_body if atom not in self.false]
+            if len(false_literals) == 1 and false_literals[0] in rule.pos_body and \
+                    false_literals[0] in self.false and false_literals[0] not in self.aggregates and \
+                    self.__false_head(rule):
+                required_to_falsify[rule.id] = false_literals[0]
+
+        def explain(atom, reason) -> None:
+            if atom not in res and (atom in self.true or atom in self.false):
+                res[atom] = reason
+                queue.append(atom)
+
+        def check(rule) -> None:
+            if missing_true_literals[rule.id] > 0:
+                return
+            if rule.id in true_body:
+                choice = self.choices.get(rule.id)
+                for atom in rule.head:
+                    if atom in self.true:
+                        explain(atom, Tuple_([Function("support"), rule.id]))
+                    elif choice is not None and choice[1] != Function("unbounded") and \
+                            explained_true_heads[rule.id] == choice[1].number:
+                        explain(atom, Tuple_([Function("choice_rule"), rule.id]))
+            if rule.id in required_to_falsify and missing_heads[rule.id] == 0:
+                explain(required_to_falsify[rule.id], Tuple_([Function("required_to_falsify_body"), rule.id]))
+
+        for atom in explained_by_initial_well_founded:
+            explain(atom.value.arguments[0], Function("initial_well_founded"))
+        for atom in assumption_set:
+            explain(atom.value.arguments[0], Function("assumption"))
+        for atom, rules in rules_without_false_body.items():
+            if rules == 0:
+                explain(atom, Function("lack_of_support"))
+        for rule in self.rules.values():
+            check(rule)
+        while queue:
+            atom = queue.pop()
+            for rule, positive in self.atom2bodies.get(atom, ()):
+                if positive == (atom in self.true):
+                    missing_true_literals[rule.id] -= 1
+                    check(rule)
+                elif rule.id not in false_body:
+                    false_body.add(rule.id)
+                    for head_atom in rule.head:
+                        if head_atom in self.false:
+                            rules_without_false_body[head_atom] -= 1
+                            if rules_without_false_body[head_atom] == 0:
+                                explain(head_atom, Function("lack_of_support"))
+            for rule in self.atom2heads.get(atom, ()):
+                missing_heads[rule.id] -= 1
+                if atom in self.true:
+                    explained_true_heads[rule.id] += 1
+                check(rule)
+        if len(res) < len(self.true) + len(self.false):
+            return None
+        return list(res.items())
+
+    def __false_head(self, rule) -> bool:
+        if rule.id not in self.choices:
+            return all(atom in self.false for atom in rule.head)
+        lower_bound, upper_bound = self.choices[rule.id]
+        return not lower_bound <= Number(sum(1 for atom in rule.head if atom in self.true)) <= upper_bound
+
+    def indexed_explanation_sequence(self, explained_by: list[tuple[Symbol, Symbol]]) -> Model:
+        """
+        Number the explained atoms according to the given order and keep only atoms connected to the query.
+        The order must be the one in which INDEXED_EXPLAIN_ENCODING derives indexed_explained_by/2.
+        The returned model is not sorted.
+        """
+        relevant = self.relevant_atoms(explained_by)
+        return Model.of_atoms(*(
+            Function("explained_by", [Number(index), atom, reason])
+            for index, (atom, reason) in enumerate(((atom, reason) for atom, reason in explained_by
+                                                    if atom in relevant), start=1)
+        ), sort=False)
+
+    def relevant_atoms(self, explained_by: list[tuple[Symbol, Symbol]]) -> set:
+        index = {atom: position for position, (atom, reason) in enumerate(explained_by)}
+        reason_of = dict(explained_by)
+
+        def explained_before(atom, other_atom):
+            return atom in index and index[atom] < index[other_atom]
+
+        queue = list(self.explain) if self.explain else list(index.keys())
+        res = set()
+        while queue:
+            atom = queue.pop()
+            if atom in res:
+                continue
+            res.add(atom)
+            if atom not in reason_of:
+                continue
+            reason = reason_of[atom]
+            if reason.name == "lack_of_support":
+                for rule in self.atom2heads.get(atom, ()):
+                    queue.extend(body_atom for body_atom in rule.pos_body
+                                 if body_atom in self.false and explained_before(body_atom, atom))
+                    queue.extend(body_atom for body_atom in rule.neg_body
+                                 if body_atom in self.true and explained_before(body_atom, atom))
+            elif reason.name == "":
+                kind, rule = reason.arguments[0].name, self.rules[reason.arguments[1]]
+                if kind == "required_to_falsify_body":
+                    queue.extend(rule.head)
+                elif kind == "choice_rule":
+                    queue.extend(head_atom for head_atom in rule.head if head_atom in self.true)
+                queue.extend(rule.pos_body)
+                queue.extend(rule.neg_body)
+        return res
+
+
+PRUNE_SERIALIZATION_VERSION: Final = 2
+"""
+Version of the pruning of the serialization in Python, part of the cache keys (see xasp.entities.ENCODING_VERSION).
+Bump it whenever the output of PruneSerializationContext may change for the same input.
+"""
+
+
+@typeguard.typechecked
+@dataclasses.dataclass(frozen=True)
+class PruneSerializationContext:
+    """
+    Not modified after of_serialization() (lookups do not add keys to the indices), hence it can be shared among
+    threads.
+    """
+    Rule = namedtuple("Rule", "id head pos_body neg_body")
+
+    rules: dict = dataclasses.field(default_factory=dict)
+    choices: dict = dataclasses.field(default_factory=dict)
+    true: set = dataclasses.field(default_factory=set)
+    false: set = dataclasses.field(default_factory=set)
+    aggregates: set = dataclasses.field(default_factory=set)
+    explain: list = dataclasses.field(default_factory=list)
+    atom2heads: dict = dataclasses.field(default_factory=lambda: defaultdict(list))
+    atom2pos_bodies: dict = dataclasses.field(default_factory=lambda: defaultdict(list))
+
+    @staticmethod
+    def of_serialization(serialization: Model) -> "PruneSerializationContext":
+        res = PruneSerializationContext()
+        atoms = [(atom.value.name, atom.value.arguments) for atom in serialization]
+        for name, arguments in atoms:
+            if name == "rule" and len(arguments) == 1:
+                res.rules[arguments[0]] = PruneSerializationContext.Rule(arguments[0], [], [], [])
+        for name, arguments in atoms:
+            if name in ["head", "pos_body", "neg_body"] and len(arguments) == 2:
+                rule, head_or_body_atom = arguments
+                getattr(res.rules[rule], name).append(head_or_body_atom)
+                if name == "head":
+                    res.atom2heads[head_or_body_atom].append(res.rules[rule])
+                elif name == "pos_body":
+                    res.atom2pos_bodies[head_or_body_atom].append(res.rules[rule])
+            elif name == "choice" and len(arguments) == 3:
+                res.choices[arguments[0]] = (arguments[1], arguments[2])
+            elif name in ["true", "false"] and len(arguments) == 1:
+                getattr(res, name).add(arguments[0])
+            elif name == "aggregate" and len(arguments) == 1:
+                res.aggregates.add(arguments[0])
+            elif name == "explain" and len(arguments) == 1:
+                res.explain.append(arguments[0])
+        return res
+
+    def relevant(self, explained_by_initial_well_founded: set, explain: Optional[list] = None) -> tuple[set, set]:
+        """
+        The atoms and rules that can contribute to explain the atoms to explain (or the given atoms), obtained by
+        walking backwards the reasons of EXPLAIN_ENCODING that can apply in the answer set (support, lack of support,
+        required to falsify body, choice rule). Atoms explained by the initial well-founded model need nothing else.
+        """
+        atoms, rules = set(self.explain if explain is None else explain), set()
+        queue = list(atoms)
+
+        def need(rule, needed_atoms) -> None:
+            rules.add(rule.id)
+            for atom in needed_atoms:
+                if atom not in atoms:
+                    atoms.add(atom)
+                    queue.append(atom)
+
+        while queue:
+            atom = queue.pop()
+            if atom in explained_by_initial_well_founded:
+                continue
+            if atom in self.true:
+                for rule in self.atom2heads.get(atom, ()):
+                    if self.__true_body(rule):
+                        need(rule, rule.pos_body + rule.neg_body)
+            elif atom in self.false:
+                for rule in self.atom2heads.get(atom, ()):
+                    need(rule, [body_atom for body_atom in rule.pos_body if body_atom in self.false] +
+                         [body_atom for body_atom in rule.neg_body if body_atom in self.true])
+                    if rule.id in self.choices and self.choices[rule.id][1] != Function("unbounded") and \
+                            self.__true_body(rule) and self.__true_heads(rule) == self.choices[rule.id][1]:
+                        need(rule, rule.pos_body + rule.neg_body + rule.head)
+                if atom not in self.aggregates:
+                    for rule in self.atom2pos_bodies.get(atom, ()):
+                        if self.__false_head(rule) and self.__true_body(rule, but=atom):
+                            need(rule, rule.pos_body + rule.neg_body + rule.head)
+        return atoms, rules
+
+    def prune(self, serialization: Model, explained_by_initial_well_founded: set,
+              explain: Optional[list] = None) -> Model:
+        """
+        Keep the facts of the serialization on the relevant atoms and rules (the whole serialization if there are no
+        atoms to explain). If explain is given, it replaces the atoms to explain of the serialization.
+        The returned model is not sorted.
+        """
+        roots = set(self.explain if explain is None else explain)
+        if not roots:
+            return serialization
+        atoms, rules = self.relevant(explained_by_initial_well_founded, list(roots))
+        # the id of rules of false aggregates is a tuple whose first argument is the aggregate
+        rule_names = {(rule if rule.name else rule.arguments[0]).name for rule in rules
+                      if rule.type == SymbolType.Function}
+        res = []
+        for atom in serialization:
+            symbol = atom.value
+            name, arguments = symbol.name, symbol.arguments
+            if name in ["rule", "head", "pos_body", "neg_body", "choice"]:
+                keep = arguments[0] in rules
+            elif name in ["true", "false", "aggregate"] and len(arguments) == 1:
+                keep = arguments[0] in atoms
+            elif name == "explain" and len(arguments) == 1:
+                keep = arguments[0] in roots
+            elif name == "original_rule":
+                keep = arguments[0].name in rule_names
+            else:
+                keep = True
+            if keep:
+                res.append(symbol)
+        return Model.of_atoms(*res, sort=False)
+
+    def __true_body(self, rule, but=None) -> bool:
+        return all(atom in self.true for atom in rule.pos_body if atom != but) and \
+            all(atom in self.false for atom in rule.neg_body)
+
+    def __true_heads(self, rule) -> Symbol:
+        return Number(sum(1 for atom in rule.head if atom in self.true))
 
-    def index(self):
-        self.__index[0] += 1
-        return Number(self.__index[0])
+    def __false_head(self, rule) -> bool:
+        if rule.id not in self.choices:
+            return all(atom in self.false for atom in rule.head)
+        lower_bound, upper_bound = self.choices[rule.id]
+        # as in clingo, numbers precede unbounded
+        return not lower_bound <= self.__true_heads(rule) <= upper_bound
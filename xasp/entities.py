@@ -1,71 +1,229 @@
+import asyncio
 import base64
 import dataclasses
+import functools
+import hashlib
 import json
+import resource
+import sys
+import threading
+import time
 import webbrowser
 import zlib
+from collections import defaultdict, deque
 from dataclasses import InitVar
 from enum import auto, IntEnum
 from pathlib import Path
-from typing import Callable, Final, Optional, Dict, List, Any, Union
+from typing import Callable, Final, Optional, Dict, List, Any, Union, Iterator
 
 import clingo
+import clingo.ast
 import igraph
 import typeguard
 from clingo import Model
 from dumbo_asp.primitives.models import Model
 from dumbo_asp.primitives.predicates import Predicate
-from dumbo_asp.primitives.atoms import GroundAtom
 from dumbo_utils.url import compress_object_for_url
 from valid8 import validate
 
-from xasp.contexts import ComputeExplanationContext, ProcessAggregatesContext, ComputeWellFoundedContext
+from xasp.cache import Cache, default_cache
+from xasp.navigator import write_navigator_graph, NavigatorServer
+from xasp.contexts import ComputeExplanationContext, ProcessAggregatesContext, ComputeWellFoundedContext, \
+    PruneSerializationContext, PROCESS_AGGREGATES_VERSION, WELL_FOUNDED_VERSION, EXPLANATION_VERSION, \
+    PRUNE_SERIALIZATION_VERSION
 from dumbo_utils.primitives import PositiveIntegerOrUnbounded
-from xasp.transformers import ProgramSerializerTransformer
+from xasp.transformers import ProgramSerializerTransformer, ConeOfInfluenceTransformer
 from xasp.utils import call_with_difference_if_invalid_index
 
 
 @typeguard.typechecked
 @dataclasses.dataclass
 class Explain:
+    """
+    Instances can be shared among threads, as their public methods hold a lock of the instance.
+    Different instances proceed concurrently, as clingo releases the GIL while grounding and solving.
+    """
     key: InitVar[Any]
     __key = object()
+    __shared_lock = threading.Lock()
 
     __state: "Explain.State" = dataclasses.field(default_factory=lambda: Explain.State.INITIAL, init=False)
     __commands_implementation: Dict[str, Callable] = dataclasses.field(default_factory=dict)
     __asp_program: Optional[str] = dataclasses.field(default=None, init=False)
+    __prepared_program: Optional["Explain.PreparedProgram"] = dataclasses.field(default=None, init=False)
+    __cone_of_influence: bool = dataclasses.field(default=False, init=False)
     __answer_set: Optional[Model] = dataclasses.field(default=None, init=False)
     __additional_atoms_in_the_base: Optional[Model] = dataclasses.field(default=None, init=False)
     __atoms_to_explain: Optional[Model] = dataclasses.field(default=None, init=False)
-    __serialization: Model = dataclasses.field(default=Model.empty(), init=False)
+    __serialization_value: Optional[Model] = dataclasses.field(default=Model.empty(), init=False)
+    __serialization_stages: List[Callable[[], Model]] = dataclasses.field(default_factory=list, init=False)
     __atoms_explained_by_initial_well_founded: Model = dataclasses.field(default=Model.empty(), init=False)
     __minimal_assumption_sets: List[Model] = dataclasses.field(default_factory=list, init=False)
     __minimal_assumption_sets_block_constraints: List[str] = dataclasses.field(default_factory=list, init=False)
+    __minimal_assumption_sets_control: Optional[clingo.Control] = dataclasses.field(default=None, init=False)
     __explanation_sequences: List[Model] = dataclasses.field(default_factory=list, init=False)
     __explanation_dags: List[Model] = dataclasses.field(default_factory=list, init=False)
     __igraph: List[Optional[igraph.Graph]] = dataclasses.field(default_factory=list, init=False)
+    __layouts: List[Dict[str, igraph.Layout]] = dataclasses.field(default_factory=list, init=False)
+    __distance: Optional[int] = dataclasses.field(default=None, init=False)
+    __cache: Optional[Cache] = dataclasses.field(default_factory=default_cache, init=False)
+    __serialization_key: Optional[str] = dataclasses.field(default=None, init=False)
+    __minimal_assumption_sets_keys: List[str] = dataclasses.field(default_factory=list, init=False)
+    __explanation_sequences_keys: List[str] = dataclasses.field(default_factory=list, init=False)
+    __explanation_sequences_assumption_sets: List[int] = dataclasses.field(default_factory=list, init=False)
+    __explanation_dags_keys: List[str] = dataclasses.field(default_factory=list, init=False)
+    __explanation_dags_sequences: List[int] = dataclasses.field(default_factory=list, init=False)
+    __explanation_context_value: Optional[ComputeExplanationContext] = dataclasses.field(default=None, init=False)
+    __shared_prune_context: Optional[List[PruneSerializationContext]] = dataclasses.field(default=None, init=False)
+    __explanation_sequences_control: Optional[clingo.Control] = dataclasses.field(default=None, init=False)
+    __explanation_sequences_control_assumption_set: int = dataclasses.field(default=-1, init=False)
+    __explanation_sequences_blocked: int = dataclasses.field(default=0, init=False)
+    __explanation_dags_control: Optional[clingo.Control] = dataclasses.field(default=None, init=False)
+    __explanation_dags_control_sequence: int = dataclasses.field(default=-1, init=False)
+    __explanation_dags_blocked: int = dataclasses.field(default=0, init=False)
+    __stats: List["Explain.StageStats"] = dataclasses.field(default_factory=list, init=False)
+    __clingo_statistics: Dict[str, Any] = dataclasses.field(default_factory=dict, init=False)
+    __lock: Any = dataclasses.field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+    __solving: Optional[clingo.Control] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    __interrupted: bool = dataclasses.field(default=False, init=False, repr=False, compare=False)
+    __solving_lock: Any = dataclasses.field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    __deadline: Optional[float] = dataclasses.field(default=None, init=False, repr=False, compare=False)
+    __optimal: bool = dataclasses.field(default=True, init=False, repr=False, compare=False)
+    __minimal_assumption_sets_optimal: List[bool] = dataclasses.field(default_factory=list, init=False)
+    __stage_hooks = []
 
     class State(IntEnum):
         INITIAL = auto()
         SERIALIZED = auto()
         AGGREGATE_PROCESSED = auto()
         WELL_FOUNDED_COMPUTED = auto()
+        PRUNED = auto()
         MINIMAL_ASSUMPTION_SET_COMPUTED = auto()
         EXPLANATION_SEQUENCE_COMPUTED = auto()
         EXPLANATION_DAG_COMPUTED = auto()
         IGRAPH_COMPUTED = auto()
 
+    @typeguard.typechecked
+    @dataclasses.dataclass(frozen=True)
+    class PreparedProgram:
+        """
+        A program parsed and serialized once, to be explained with respect to several answer sets.
+        Obtain instances by calling Explain.prepare_program().
+        Statements are shared by all instances explaining the program, and are added to their controls one at a time
+        (reference counts of clingo AST nodes are not thread-safe).
+        """
+        value: str
+        statements: tuple[clingo.ast.AST, ...]
+        rules: int
+        aggregates: int
+        lock: Any = dataclasses.field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @typeguard.typechecked
+    @dataclasses.dataclass(frozen=True)
+    class StageStats:
+        """
+        Resources spent to reach a state (once per step for the enumerated states, where step is the index of the
+        computed element, or of the exhausted enumeration).
+        Times are in seconds; cpu_time is the CPU time of the thread running the stage, which also grounds and solves
+        with clingo, so it includes clingo but not other threads (e.g., of explain_all).
+        max_rss is the maximum resident set size of the process (in bytes) since it started, measured at the end of
+        the stage; it is process-wide, so it cannot be charged to a single stage.
+        clingo_statistics maps the name of each encoding solved in the stage to the statistics of its control
+        (ground program size, choices, conflicts, optimization, times, ...); it is empty for native and cached stages.
+        optimal is False if the budget of the stage expired before clingo proved its output optimal.
+        """
+        state: "Explain.State"
+        step: int
+        wall_time: float
+        cpu_time: float
+        max_rss: int
+        cached: bool
+        clingo_statistics: Dict[str, Any] = dataclasses.field(default_factory=dict)
+        optimal: bool = True
+
+        @staticmethod
+        def start() -> tuple[float, float]:
+            return time.perf_counter(), time.thread_time()
+
+        @staticmethod
+        def since(start: tuple[float, float], state: "Explain.State", step: int, cached: bool,
+                  clingo_statistics: Optional[Dict[str, Any]] = None, optimal: bool = True) -> "Explain.StageStats":
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return Explain.StageStats(
+                state=state,
+                step=step,
+                wall_time=time.perf_counter() - start[0],
+                cpu_time=time.thread_time() - start[1],
+                max_rss=max_rss if sys.platform == "darwin" else max_rss * 1024,
+                cached=cached,
+                clingo_statistics=clingo_statistics or {},
+                optimal=optimal,
+            )
+
+        def as_dict(self) -> Dict[str, Any]:
+            res = dataclasses.asdict(self)
+            res["state"] = self.state.name
+            return res
+
+    StageHook = Callable[["Explain", "Explain.StageStats"], None]
+
+    class Interrupted(Exception):
+        """
+        Raised by a stage whose solving was interrupted, because the coroutine awaiting it was cancelled or because
+        its budget expired before clingo found any model.
+        The stage can be computed again.
+        """
+
     def __post_init__(self, key):
         validate("key", key, equals=self.__key, help_msg="Use a factory method")
 
+    @staticmethod
+    def add_stage_hook(hook: "Explain.StageHook") -> None:
+        """
+        Call hook(explain, stats) after every stage of every Explain instance.
+        """
+        Explain.__stage_hooks.append(hook)
+
+    @staticmethod
+    def remove_stage_hook(hook: "Explain.StageHook") -> None:
+        Explain.__stage_hooks.remove(hook)
+
+    @staticmethod
+    def prepare_program(value: str) -> "Explain.PreparedProgram":
+        transformer = ProgramSerializerTransformer()
+        statements = []
+        clingo.ast.parse_string(SERIALIZATION_ENCODING + transformer.apply(value), statements.append)
+        return Explain.PreparedProgram(
+            value=value,
+            statements=tuple(statements),
+            rules=transformer.last_rule_index,
+            aggregates=transformer.last_aggregate_index,
+        )
+
     @staticmethod
     def the_program(
-            value: str,
+            value: Union[str, "Explain.PreparedProgram"],
             the_answer_set: Model,
             the_atoms_to_explain: Model = Model.empty(),
-            the_additional_atoms_in_the_base: Model = Model.empty()
+            the_additional_atoms_in_the_base: Model = Model.empty(),
+            cone_of_influence: bool = False,
     ) -> "Explain":
+        """
+        With cone_of_influence=True, the program is sliced before serialization: only the rules that can derive
+        (the predicates of) the atoms to explain, and the constraints on them, are kept (see
+        ConeOfInfluenceTransformer), and atoms of other predicates are dropped from the answer set and the base.
+        """
         res = Explain(key=Explain.__key)
-        res.__asp_program = value
+        if cone_of_influence:
+            validate("value", value, instance_of=str, help_msg="Slicing requires the program as a string")
+            validate("the_atoms_to_explain", the_atoms_to_explain, min_len=1,
+                     help_msg="Slicing requires atoms to explain")
+        res.__cone_of_influence = cone_of_influence
+        if type(value) is str:
+            res.__asp_program = value
+        else:
+            res.__asp_program = value.value
+            res.__prepared_program = value
         res.__answer_set = the_answer_set
         res.__atoms_to_explain = the_atoms_to_explain
         res.__additional_atoms_in_the_base = the_additional_atoms_in_the_base
@@ -81,9 +239,12 @@ class Explain:
     ) -> "Explain":
         res = Explain(key=Explain.__key)
         res.__serialization = value
+        res.__serialization_stages.append(lambda: value)
         res.__answer_set = the_answer_set
         res.__atoms_to_explain = the_atoms_to_explain
         res.__additional_atoms_in_the_base = the_additional_atoms_in_the_base
+        if res.__cache is not None:
+            res.__serialization_key = Cache.key("the_serialization", Cache.digest_of(value))
         res.__state = Explain.State.SERIALIZED
         return res
 
@@ -103,104 +264,299 @@ class Explain:
         res.__state = Explain.State.EXPLANATION_DAG_COMPUTED
         return res
 
+    @staticmethod
+    def explain_many(
+            value: Union[str, "Explain.PreparedProgram"],
+            the_answer_set: Model,
+            the_atoms_to_explain: Model,
+            the_additional_atoms_in_the_base: Model = Model.empty(),
+            cone_of_influence: bool = False,
+    ) -> Iterator["Explain"]:
+        """
+        Explain each of the atoms to explain separately, yielding an instance per atom (in the given order) as soon
+        as its explanation DAG is computed.
+        Serialization, aggregates and the initial well-founded model are computed once, for all atoms (which are
+        therefore all added to the base); only the next stages, starting from pruning, are computed for each atom.
+        """
+        shared = Explain.the_program(
+            value,
+            the_answer_set=the_answer_set,
+            the_atoms_to_explain=the_atoms_to_explain,
+            the_additional_atoms_in_the_base=the_additional_atoms_in_the_base,
+            cone_of_influence=cone_of_influence,
+        )
+        shared.compute_atoms_explained_by_initial_well_founded()
+        serialization = shared.__serialization
+        prune_context = []
+        for atom in the_atoms_to_explain:
+            res = Explain(key=Explain.__key)
+            res.__asp_program = shared.__asp_program
+            res.__answer_set = shared.__answer_set
+            res.__atoms_to_explain = Model.of_atoms(atom)
+            res.__additional_atoms_in_the_base = shared.__additional_atoms_in_the_base
+            res.__serialization_value = serialization
+            res.__serialization_stages.append(lambda: serialization)
+            if shared.__serialization_key is not None:
+                res.__serialization_key = Cache.key("explain_many", shared.__serialization_key, str(atom))
+            res.__atoms_explained_by_initial_well_founded = shared.__atoms_explained_by_initial_well_founded
+            res.__shared_prune_context = prune_context
+            res.__state = Explain.State.WELL_FOUNDED_COMPUTED
+            res.compute_explanation_dag()
+            yield res
+
     def process_aggregates(self) -> None:
-        if self.__state >= Explain.State.AGGREGATE_PROCESSED:
-            return
-        if self.__state < Explain.State.SERIALIZED:
-            self.__compute_serialization()
-        validate("state", self.__state, equals=Explain.State.SERIALIZED)
-        self.__serialization = self.__process_aggregates()
-        self.__state = Explain.State.AGGREGATE_PROCESSED
+        with self.__lock:
+            if self.__state >= Explain.State.AGGREGATE_PROCESSED:
+                return
+            if self.__state < Explain.State.SERIALIZED:
+                self.__compute_serialization()
+            validate("state", self.__state, equals=Explain.State.SERIALIZED)
+            self.__serialization_stages.append(self.__process_aggregates)
+            self.__serialization_value, self.__serialization_key = self.__cached(
+                self.__process_aggregates, Explain.State.AGGREGATE_PROCESSED, 0, self.__serialization_key, lazy=True,
+            )
+            self.__state = Explain.State.AGGREGATE_PROCESSED
 
     def compute_atoms_explained_by_initial_well_founded(self) -> None:
-        if self.__state >= Explain.State.WELL_FOUNDED_COMPUTED:
-            return
-        if self.__state < Explain.State.AGGREGATE_PROCESSED:
-            self.process_aggregates()
-        validate("state", self.__state, equals=Explain.State.AGGREGATE_PROCESSED)
-        self.__atoms_explained_by_initial_well_founded = self.__compute_atoms_explained_by_initial_well_founded()
-        self.__state = Explain.State.WELL_FOUNDED_COMPUTED
-
-    def compute_minimal_assumption_set(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1) -> None:
-        if type(repeat) is int:
-            repeat = PositiveIntegerOrUnbounded.of(repeat)
-        if self.__state < Explain.State.WELL_FOUNDED_COMPUTED:
-            self.compute_atoms_explained_by_initial_well_founded()
-        validate("state", self.__state, min_value=Explain.State.WELL_FOUNDED_COMPUTED)
-        repeat += len(self.__minimal_assumption_sets)
-        while repeat.greater_than(len(self.__minimal_assumption_sets)):
-            assumption_set = self.__compute_minimal_assumption_set()
-            if assumption_set is None:
-                break
-            self.__minimal_assumption_sets.append(assumption_set)
-        self.__state = max(self.__state, Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED)
-
-    def compute_explanation_sequence(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1) -> None:
-        if type(repeat) is int:
-            repeat = PositiveIntegerOrUnbounded.of(repeat)
-        if self.__state < Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED:
-            self.compute_minimal_assumption_set()
-        validate("state", self.__state, min_value=Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED)
-        repeat += len(self.__explanation_sequences)
-        while repeat.greater_than(len(self.__explanation_sequences)):
-            explanation = self.__compute_explanation_sequence()
-            if explanation is not None:
-                self.__explanation_sequences.append(explanation)
-            else:
-                assumption_sets = len(self.__minimal_assumption_sets)
-                self.compute_minimal_assumption_set()
-                if len(self.__minimal_assumption_sets) == assumption_sets:
+        with self.__lock:
+            if self.__state >= Explain.State.WELL_FOUNDED_COMPUTED:
+                return
+            if self.__state < Explain.State.AGGREGATE_PROCESSED:
+                self.process_aggregates()
+            validate("state", self.__state, equals=Explain.State.AGGREGATE_PROCESSED)
+            self.__atoms_explained_by_initial_well_founded, _ = self.__cached(
+                self.__compute_atoms_explained_by_initial_well_founded, Explain.State.WELL_FOUNDED_COMPUTED, 0,
+                self.__serialization_key,
+            )
+            self.__state = Explain.State.WELL_FOUNDED_COMPUTED
+
+    def prune_serialization(self) -> None:
+        """
+        Restrict the serialization to the ground atoms and rules that can contribute to explain the atoms to explain
+        (see PruneSerializationContext), so that the next stages ground only that slice.
+        """
+        with self.__lock:
+            if self.__state >= Explain.State.PRUNED:
+                return
+            if self.__state < Explain.State.WELL_FOUNDED_COMPUTED:
+                self.compute_atoms_explained_by_initial_well_founded()
+            validate("state", self.__state, equals=Explain.State.WELL_FOUNDED_COMPUTED)
+            self.__serialization_stages.append(self.__prune_serialization)
+            self.__serialization_value, self.__serialization_key = self.__cached(
+                self.__prune_serialization, Explain.State.PRUNED, 0, self.__serialization_key, lazy=True,
+            )
+            self.__state = Explain.State.PRUNED
+
+    def compute_minimal_assumption_set(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1,
+                                       budget: Optional[float] = None) -> None:
+        """
+        If budget is given, the computation of each assumption set is given budget seconds: when they expire, the best
+        assumption set found so far is taken, and flagged as non-optimal (see minimal_assumption_set_is_optimal());
+        Explain.Interrupted is raised if none was found.
+        Non-optimal assumption sets are not cached.
+        """
+        with self.__lock:
+            if type(repeat) is int:
+                repeat = PositiveIntegerOrUnbounded.of(repeat)
+            if budget is not None:
+                validate("budget", budget, min_value=0)
+            if self.__state < Explain.State.PRUNED:
+                self.prune_serialization()
+            validate("state", self.__state, min_value=Explain.State.PRUNED)
+            repeat += len(self.__minimal_assumption_sets)
+            while repeat.greater_than(len(self.__minimal_assumption_sets)):
+                assumption_set, key = self.__cached(
+                    self.__compute_minimal_assumption_set, Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED,
+                    len(self.__minimal_assumption_sets), self.__serialization_key,
+                    Cache.digest_of(self.atoms_to_explain), *self.__minimal_assumption_sets_keys, budget=budget,
+                )
+                if assumption_set is None:
                     break
-        self.__state = max(self.__state, Explain.State.EXPLANATION_SEQUENCE_COMPUTED)
-
-    def compute_explanation_dag(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1) -> None:
-        if type(repeat) is int:
-            repeat = PositiveIntegerOrUnbounded.of(repeat)
-        if self.__state < Explain.State.EXPLANATION_SEQUENCE_COMPUTED:
-            self.compute_explanation_sequence()
-        validate("state", self.__state, min_value=Explain.State.EXPLANATION_SEQUENCE_COMPUTED)
-        repeat += len(self.__explanation_dags)
-        while repeat.greater_than(len(self.__explanation_dags)):
-            dag = self.__compute_explanation_dag()
-            if dag is not None:
-                self.__explanation_dags.append(dag)
-            else:
-                sequences = len(self.__explanation_sequences)
-                self.compute_explanation_sequence()
-                if len(self.__explanation_sequences) == sequences:
-                    break
-        self.__state = Explain.State.EXPLANATION_DAG_COMPUTED
-
-    def compute_igraph(self, index: int = -1) -> None:
-        validate("answer_set", self.__answer_set, help_msg="Answer set was not provided")
-        validate("atoms_to_explain", self.__atoms_to_explain, help_msg="Atoms to explain were not provided")
-        validate("additional_atoms_in_the_base", self.__additional_atoms_in_the_base,
-                 help_msg="Additional atoms were not provided")
-        validate("must have a DAG", self.explanation_dag(index), help_msg="No DAG with the given index")
-        while len(self.__igraph) < self.explanation_dags:
-            self.__igraph.append(None)
-        if self.__igraph[index] is None:
-            self.__igraph[index] = self.__compute_igraph(dag=self.__explanation_dags[index])
-        self.__state = max(self.__state, Explain.State.IGRAPH_COMPUTED)
-
-    def save_igraph(self, filename: Path, index: int = -1, **kwargs) -> None:
-        self.compute_igraph(index)
-        igraph.plot(
-            self.__igraph[index],
-            layout=self.__igraph[index].layout_sugiyama(),
-            margin=140,
-            target=filename,
-            vertex_label_dist=2,
-            vertex_size=8,
-            **kwargs,
-        )
+                self.__minimal_assumption_sets.append(assumption_set)
+                self.__minimal_assumption_sets_keys.append(key)
+                self.__minimal_assumption_sets_optimal.append(self.__optimal)
+            self.__state = max(self.__state, Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED)
+
+    def compute_explanation_sequence(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1,
+                                     budget: Optional[float] = None) -> None:
+        """
+        If budget is given, it applies to the computation of each sequence and of each required assumption set (see
+        compute_minimal_assumption_set()); Explain.Interrupted is raised if it expires before finding a sequence.
+        """
+        with self.__lock:
+            if type(repeat) is int:
+                repeat = PositiveIntegerOrUnbounded.of(repeat)
+            if budget is not None:
+                validate("budget", budget, min_value=0)
+            if self.__state < Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED:
+                self.compute_minimal_assumption_set(budget=budget)
+            validate("state", self.__state, min_value=Explain.State.MINIMAL_ASSUMPTION_SET_COMPUTED)
+            repeat += len(self.__explanation_sequences)
+            while repeat.greater_than(len(self.__explanation_sequences)):
+                explanation, key = self.__cached(
+                    self.__compute_explanation_sequence, Explain.State.EXPLANATION_SEQUENCE_COMPUTED,
+                    len(self.__explanation_sequences), self.__serialization_key,
+                    self.__minimal_assumption_sets_keys[-1] if self.__cache is not None else None,
+                    *self.__explanation_sequences_keys, budget=budget,
+                )
+                if explanation is not None:
+                    self.__explanation_sequences.append(explanation)
+                    self.__explanation_sequences_keys.append(key)
+                    self.__explanation_sequences_assumption_sets.append(len(self.__minimal_assumption_sets) - 1)
+                else:
+                    assumption_sets = len(self.__minimal_assumption_sets)
+                    self.compute_minimal_assumption_set(budget=budget)
+                    if len(self.__minimal_assumption_sets) == assumption_sets:
+                        break
+            self.__state = max(self.__state, Explain.State.EXPLANATION_SEQUENCE_COMPUTED)
+
+    def compute_explanation_dag(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1,
+                                distance: Optional[int] = None, budget: Optional[float] = None) -> None:
+        """
+        If distance is given, DAGs only explain atoms at distance less than distance from the atoms to explain.
+        The distance is the same for all DAGs of an instance, and cannot be changed after computing a DAG or igraph.
+        If budget is given, it applies to the computation of each DAG and of each required sequence and assumption set
+        (see compute_explanation_sequence()).
+        """
+        with self.__lock:
+            if type(repeat) is int:
+                repeat = PositiveIntegerOrUnbounded.of(repeat)
+            if budget is not None:
+                validate("budget", budget, min_value=0)
+            self.__set_distance(distance)
+            if self.__state < Explain.State.EXPLANATION_SEQUENCE_COMPUTED:
+                self.compute_explanation_sequence(budget=budget)
+            validate("state", self.__state, min_value=Explain.State.EXPLANATION_SEQUENCE_COMPUTED)
+            repeat += len(self.__explanation_dags)
+            while repeat.greater_than(len(self.__explanation_dags)):
+                dag, key = self.__cached(
+                    self.__compute_explanation_dag, Explain.State.EXPLANATION_DAG_COMPUTED,
+                    len(self.__explanation_dags), self.__serialization_key,
+                    self.__explanation_sequences_keys[-1] if self.__cache is not None else None, str(self.__distance),
+                    *self.__explanation_dags_keys, budget=budget,
+                )
+                if dag is not None:
+                    self.__explanation_dags.append(dag)
+                    self.__explanation_dags_keys.append(key)
+                    self.__explanation_dags_sequences.append(len(self.__explanation_sequences) - 1)
+                else:
+                    sequences = len(self.__explanation_sequences)
+                    self.compute_explanation_sequence(budget=budget)
+                    if len(self.__explanation_sequences) == sequences:
+                        break
+            self.__state = Explain.State.EXPLANATION_DAG_COMPUTED
+
+    async def acompute_minimal_assumption_set(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1,
+                                              budget: Optional[float] = None) -> None:
+        """
+        Same as compute_minimal_assumption_set(), but computed in the default executor of the running loop, so that
+        the loop is not blocked.
+        Cancelling the awaiting task interrupts the running solve call; the cancellation is propagated as soon as the
+        current stage terminates (grounding is not interrupted), and the stage can be computed again later.
+        """
+        await self.__run_async(self.compute_minimal_assumption_set, repeat, budget)
+
+    async def acompute_explanation_sequence(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1,
+                                            budget: Optional[float] = None) -> None:
+        """
+        Same as compute_explanation_sequence(), without blocking the running loop (see
+        acompute_minimal_assumption_set()).
+        """
+        await self.__run_async(self.compute_explanation_sequence, repeat, budget)
+
+    async def acompute_explanation_dag(self, repeat: Union[int, PositiveIntegerOrUnbounded] = 1,
+                                       distance: Optional[int] = None, budget: Optional[float] = None) -> None:
+        """
+        Same as compute_explanation_dag(), without blocking the running loop (see acompute_minimal_assumption_set()).
+        """
+        await self.__run_async(self.compute_explanation_dag, repeat, distance, budget)
+
+    def compute_igraph(self, index: int = -1, distance: Optional[int] = None) -> None:
+        """
+        If distance is given (see compute_explanation_dag), the graph only contains the atoms at distance at most
+        distance from the atoms to explain, and links from those at distance less than distance.
+        """
+        with self.__lock:
+            self.__set_distance(distance)
+            validate("answer_set", self.__answer_set, help_msg="Answer set was not provided")
+            validate("atoms_to_explain", self.__atoms_to_explain, help_msg="Atoms to explain were not provided")
+            validate("additional_atoms_in_the_base", self.__additional_atoms_in_the_base,
+                     help_msg="Additional atoms were not provided")
+            call_with_difference_if_invalid_index(index, self.explanation_dags, self.compute_explanation_dag)
+            validate("must have a DAG", -self.explanation_dags <= index < self.explanation_dags, equals=True,
+                     help_msg="No DAG with the given index")
+            while len(self.__igraph) < self.explanation_dags:
+                self.__igraph.append(None)
+                self.__layouts.append({})
+            if self.__igraph[index] is None:
+                start = Explain.StageStats.start()
+                self.__igraph[index] = self.__compute_igraph(dag=self.__explanation_dags[index])
+                self.__record(Explain.State.IGRAPH_COMPUTED, index % self.explanation_dags, start, cached=False)
+            self.__state = max(self.__state, Explain.State.IGRAPH_COMPUTED)
+
+    @property
+    def distance(self) -> Optional[int]:
+        return self.__distance
+
+    def __set_distance(self, distance: Optional[int]) -> None:
+        if distance is None or distance == self.__distance:
+            return
+        validate("distance", distance, min_value=1)
+        # DAGs given to the_dag() have no sequence, and can be cut by the igraph
+        computed_dags = self.__explanation_dags if self.__explanation_sequences else []
+        validate("no DAG or igraph was computed", not computed_dags and not any(self.__igraph), equals=True,
+                 help_msg="The distance cannot be changed after computing DAGs")
+        self.__distance = distance
+
+    def layout(self, index: int = -1, algorithm: Optional[str] = None) -> igraph.Layout:
+        """
+        The layout of the igraph of the DAG with the given index, computed once per algorithm.
+        Algorithms are "sugiyama" and "layered" (longest-path layering with barycenter ordering, much faster on large
+        graphs); by default, "layered" is used for graphs with more than LAYERED_LAYOUT_THRESHOLD vertices.
+        """
+        with self.__lock:
+            self.compute_igraph(index)
+            graph = self.__igraph[index]
+            if algorithm is None:
+                algorithm = "sugiyama" if graph.vcount() <= LAYERED_LAYOUT_THRESHOLD else "layered"
+            validate("algorithm", algorithm, is_in=["sugiyama", "layered"])
+            layouts = self.__layouts[index]
+            if algorithm not in layouts:
+                layouts[algorithm] = graph.layout_sugiyama() if algorithm == "sugiyama" else \
+                    self.__layered_layout(graph)
+            return layouts[algorithm]
+
+    def save_igraph(self, filename: Path, index: int = -1, layout_algorithm: Optional[str] = None,
+                    distance: Optional[int] = None, **kwargs) -> None:
+        with self.__lock:
+            self.compute_igraph(index, distance)
+            igraph.plot(
+                self.__igraph[index],
+                layout=self.layout(index, layout_algorithm),
+                margin=140,
+                target=filename,
+                vertex_label_dist=2,
+                vertex_size=8,
+                **kwargs,
+            )
+
+    def show_navigator_graph(self, index: int = -1, layout_algorithm: Optional[str] = None) -> None:
+        with self.__lock:
+            self.compute_igraph(index)
+            url = "https://xasp-navigator.alviano.net/#"
+            # url = "http://localhost:5173/#"
+            url += compress_object_for_url(self.navigator_graph(index, layout_algorithm))
+            webbrowser.open(url, new=0, autoraise=True)
+
+    @property
+    def stats(self) -> tuple["Explain.StageStats", ...]:
+        return tuple(self.__stats)
 
-    def show_navigator_graph(self, index: int = -1) -> None:
-        self.compute_igraph(index)
-        url = "https://xasp-navigator.alviano.net/#"
-        # url = "http://localhost:5173/#"
-        url += compress_object_for_url(self.navigator_graph(index))
-        webbrowser.open(url, new=0, autoraise=True)
+    def stats_report(self) -> List[Dict[str, Any]]:
+        """
+        The stats of all stages as plain dictionaries, ready for json.dumps().
+        """
+        return [stats.as_dict() for stats in self.__stats]
 
     @property
     def asp_program(self) -> Optional[str]:
@@ -220,67 +576,120 @@ class Explain:
 
     @property
     def serialization(self) -> Model:
-        validate("state", self.__state, min_value=Explain.State.SERIALIZED)
-        return self.__serialization
+        with self.__lock:
+            validate("state", self.__state, min_value=Explain.State.SERIALIZED)
+            return self.__serialization.sorted
 
     @property
     def atoms_explained_by_initial_well_founded(self) -> Model:
-        if self.__state < Explain.State.WELL_FOUNDED_COMPUTED:
-            self.compute_atoms_explained_by_initial_well_founded()
-        validate("state", self.__state, min_value=Explain.State.WELL_FOUNDED_COMPUTED)
-        return self.__atoms_explained_by_initial_well_founded
+        with self.__lock:
+            if self.__state < Explain.State.WELL_FOUNDED_COMPUTED:
+                self.compute_atoms_explained_by_initial_well_founded()
+            validate("state", self.__state, min_value=Explain.State.WELL_FOUNDED_COMPUTED)
+            return self.__atoms_explained_by_initial_well_founded.sorted
 
     @property
     def minimal_assumption_sets(self) -> int:
         return len(self.__minimal_assumption_sets)
 
     def minimal_assumption_set(self, index: int = -1) -> Model:
-        call_with_difference_if_invalid_index(index, self.minimal_assumption_sets, self.compute_minimal_assumption_set)
-        return self.__minimal_assumption_sets[index]
+        with self.__lock:
+            call_with_difference_if_invalid_index(index, self.minimal_assumption_sets,
+                                                  self.compute_minimal_assumption_set)
+            return self.__minimal_assumption_sets[index].sorted
+
+    def minimal_assumption_set_is_optimal(self, index: int = -1) -> bool:
+        """
+        False if the budget of the assumption set with the given index expired before clingo proved it minimal.
+        """
+        with self.__lock:
+            call_with_difference_if_invalid_index(index, self.minimal_assumption_sets,
+                                                  self.compute_minimal_assumption_set)
+            return self.__minimal_assumption_sets_optimal[index]
 
     @property
     def explanation_sequences(self) -> int:
         return len(self.__explanation_sequences)
 
     def explanation_sequence(self, index: int = -1) -> Model:
-        call_with_difference_if_invalid_index(index, self.explanation_sequences, self.compute_explanation_sequence)
-        return self.__explanation_sequences[index]
+        with self.__lock:
+            call_with_difference_if_invalid_index(index, self.explanation_sequences, self.compute_explanation_sequence)
+            return self.__explanation_sequences[index].sorted
 
     @property
     def explanation_dags(self) -> int:
         return len(self.__explanation_dags)
 
     def explanation_dag(self, index: int = -1) -> Model:
-        call_with_difference_if_invalid_index(index, self.explanation_dags, self.compute_explanation_dag)
-        return self.__explanation_dags[index]
-
-    def navigator_graph(self, index: int = -1) -> Dict:
-        self.compute_igraph(index)
-        graph = self.__igraph[index]
-        layout = graph.layout_sugiyama()
-        res = {
-            "nodes": [
-                {
-                    "id": index,
-                    "label": node.attributes()["label"],
-                    "x": layout.coords[index][0],
-                    "y": layout.coords[index][1],
-                }
-                for index, node in enumerate(graph.vs)
-            ],
-            "links": [
-                {
-                    "source": link.tuple[0],
-                    "target": link.tuple[1],
-                    "label": link.attributes()["label"],
-                }
-                for link in graph.es
-            ],
-        }
-        return res
+        with self.__lock:
+            call_with_difference_if_invalid_index(index, self.explanation_dags, self.compute_explanation_dag)
+            return self.__explanation_dags[index].sorted
+
+    def navigator_graph(self, index: int = -1, layout_algorithm: Optional[str] = None) -> Dict:
+        with self.__lock:
+            return {
+                "nodes": list(self.navigator_nodes(index, layout_algorithm)),
+                "links": list(self.navigator_links(index)),
+            }
+
+    def navigator_nodes(self, index: int = -1, layout_algorithm: Optional[str] = None) -> Iterator[Dict]:
+        # the lock is not held while yielding
+        with self.__lock:
+            self.compute_igraph(index)
+            coords = self.layout(index, layout_algorithm).coords
+            labels = self.__igraph[index].vs["label"]
+        for node, label in enumerate(labels):
+            yield {
+                "id": node,
+                "label": label,
+                "x": coords[node][0],
+                "y": coords[node][1],
+            }
+
+    def navigator_links(self, index: int = -1) -> Iterator[Dict]:
+        with self.__lock:
+            self.compute_igraph(index)
+            graph = self.__igraph[index]
+        for (source, target), label in zip(graph.get_edgelist(), graph.es["label"] if graph.ecount() else []):
+            yield {
+                "source": source,
+                "target": target,
+                "label": label,
+            }
+
+    def serve_navigator_graph(self, index: int = -1, layout_algorithm: Optional[str] = None,
+                              host: str = "127.0.0.1", port: int = 0, open_browser: bool = True) -> NavigatorServer:
+        """
+        Start a local server answering with neighbourhoods of the navigator graph (see xasp.navigator).
+        Call stop() on the returned server to shut it down.
+        """
+        with self.__lock:
+            self.compute_igraph(index)
+            graph = self.__igraph[index]
+            names = graph.vs["name"] if graph.vcount() else []
+            roots = [node for node, name in enumerate(names) if name in {str(atom) for atom in self.__atoms_to_explain}]
+            res = NavigatorServer(graph, self.layout(index, layout_algorithm), roots, host=host, port=port).start()
+            if open_browser:
+                webbrowser.open(res.url, new=0, autoraise=True)
+            return res
+
+    def save_navigator_graph(self, target: Path, index: int = -1, layout_algorithm: Optional[str] = None,
+                             compress: bool = False) -> None:
+        """
+        Stream the navigator graph to target in JSON Lines (see xasp.navigator), optionally zlib-compressed.
+        """
+        with self.__lock:
+            self.compute_igraph(index)
+            graph = self.__igraph[index]
+            write_navigator_graph(target, graph.vcount(), graph.ecount(), self.navigator_nodes(index, layout_algorithm),
+                                  self.navigator_links(index), compress=compress)
 
     @staticmethod
-    def compute_stable_model(asp_program: str, context: Optional[Any] = None) -> Optional[Model]:
+    def compute_stable_model(asp_program: str, context: Optional[Any] = None,
+                             statistics: Optional[Dict[str, Any]] = None) -> Optional[Model]:
+        """
+        If statistics is given, it is updated with the statistics of the clingo control.
+        """
         control = clingo.Control()
         control.add("base", [], asp_program)
         control.ground([("base", [])], context=context)
@@ -288,151 +697,560 @@ class Explain:
             return Model.of_control(control)
         except Model.NoModelError:
             return None
-    
+        finally:
+            if statistics is not None:
+                statistics.update(control.statistics)
+
+    def __stable_model_of(self, control: clingo.Control, encoding: str) -> Optional[Model]:
+        # the last model is the optimum of encodings with weak constraints
+        last_model = []
+
+        def on_model(model: clingo.Model) -> None:
+            last_model[:] = [model.symbols(shown=True)]
+
+        try:
+            self.__solve(control, on_model)
+        finally:
+            self.__collect_clingo_statistics(encoding, control)
+        return Model.of_elements(*last_model[0], sort=False) if last_model else None
+
+    def __solve(self, control: clingo.Control, on_model: Callable[[clingo.Model], Any]) -> None:
+        """
+        Solve in the calling thread (so that its CPU time is charged to the stage, see StageStats), while the
+        instance can be interrupted (see __run_async), and a timer interrupts solving at the deadline of the stage
+        (if any).
+        Stopping at the deadline keeps the models found so far (so, with weak constraints, the last one may be not
+        optimal), and clears self.__optimal.
+        """
+        expired = []
+
+        def expire() -> None:
+            with self.__solving_lock:
+                if self.__solving is control:
+                    expired.append(True)
+                    control.interrupt()
+
+        with self.__solving_lock:
+            self.__solving = control
+            if self.__interrupted:
+                control.interrupt()
+        timer = None
+        if self.__deadline is not None:
+            timer = threading.Timer(self.__deadline - time.perf_counter(), expire)
+            if timer.interval > 0:
+                timer.start()
+            else:
+                expire()
+        try:
+            result = control.solve(on_model=on_model)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            with self.__solving_lock:
+                self.__solving = None
+        if not result.interrupted:
+            return
+        if not expired or self.__interrupted:
+            raise Explain.Interrupted()
+        if result.unknown:
+            raise Explain.Interrupted("The budget expired before finding any model")
+        self.__optimal = False
+
+    async def __run_async(self, method: Callable[..., None], *args: Any) -> None:
+        """
+        Run method in the default executor of the running loop.
+        If the awaiting task is cancelled, the solving of this instance is interrupted, and the cancellation is
+        propagated once method has terminated (grounding and Python stages cannot be interrupted).
+        """
+        future = asyncio.get_running_loop().run_in_executor(None, functools.partial(method, *args))
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            with self.__solving_lock:
+                self.__interrupted = True
+                if self.__solving is not None:
+                    self.__solving.interrupt()
+            try:
+                await asyncio.gather(future, return_exceptions=True)
+            finally:
+                with self.__solving_lock:
+                    self.__interrupted = False
+            raise
+
+    def __collect_clingo_statistics(self, encoding: str, control: clingo.Control) -> None:
+        self.__clingo_statistics[encoding] = control.statistics
+
+    @staticmethod
+    def __log(code: clingo.MessageCode, message: str) -> None:
+        """
+        Logger of the controls of the encodings, whose facts are added via the backend or the AST: drop the info on
+        undefined atoms (triggered by the #show directives of the encodings), and print any other message to stderr as
+        the default logger of clingo.
+        """
+        if code != clingo.MessageCode.AtomUndefined:
+            print(message, file=sys.stderr)
+
+    @staticmethod
+    def __grounded_control(encoding: str, *facts: Model) -> clingo.Control:
+        control = clingo.Control(logger=Explain.__log)
+        control.add("base", [], encoding)
+        with control.backend() as backend:
+            for model in facts:
+                for atom in model:
+                    backend.add_rule([backend.add_atom(atom.value)])
+        control.ground([("base", [])])
+        return control
+
+    @staticmethod
+    def __block(control: clingo.Control, blocked: int, models: List[Model], block: Callable[[Model], str]) -> int:
+        """
+        Add (and ground) in control the constraints blocking models[blocked:], and return len(models).
+        """
+        while blocked < len(models):
+            part = f"block_{blocked}"
+            control.add(part, [], block(models[blocked]))
+            control.ground([(part, [])])
+            blocked += 1
+        return blocked
+
+    @property
+    def __serialization(self) -> Model:
+        if self.__serialization_value is None:
+            try:
+                self.__serialization_value = self.__cache[self.__serialization_key]
+            except KeyError:
+                # evicted after the lazy hit (e.g., by another process sharing the cache): recompute it
+                self.__serialization_value = self.__recompute_serialization()
+        return self.__serialization_value
+
+    @__serialization.setter
+    def __serialization(self, value: Model) -> None:
+        self.__serialization_value = value
+
+    def __recompute_serialization(self) -> Model:
+        """
+        Run again the stages that produced the serialization, each one on the output of the previous one.
+        """
+        res = None
+        for compute in self.__serialization_stages:
+            self.__serialization_value = res
+            res = compute()
+        return res
+
+    def __cached(self, compute: Callable[[], Optional[Model]], state: "Explain.State", step: int,
+                 *inputs: Optional[str], lazy: bool = False, budget: Optional[float] = None) \
+            -> tuple[Optional[Model], Optional[str]]:
+        """
+        Return the output of the stage and its key (None if caching is disabled), and record its stats.
+        With lazy=True, the output of a cached stage is not loaded (and None is returned instead).
+        If budget is given, solving is stopped after budget seconds (see __solve), and self.__optimal tells whether
+        the output is optimal.
+        """
+        start = Explain.StageStats.start()
+        self.__optimal = True
+        if self.__cache is None:
+            res = self.__compute(compute, budget)
+            self.__record(state, step, start, cached=False, optimal=self.__optimal)
+            return res, None
+        key = Cache.key(ENCODING_VERSION, state.name, str(step), *inputs)
+        if lazy and key in self.__cache:
+            self.__record(state, step, start, cached=True)
+            return None, key
+        try:
+            res = self.__cache[key]
+            self.__record(state, step, start, cached=True)
+            return res, key
+        except KeyError:
+            pass
+        res = self.__compute(compute, budget)
+        if self.__optimal:
+            self.__cache[key] = res
+        else:
+            # outputs of expired budgets are not stored, and the next stages are keyed by their content
+            key = Cache.key(key, "non-optimal", Cache.digest_of(res))
+        self.__record(state, step, start, cached=False, optimal=self.__optimal)
+        return res, key
+
+    def __compute(self, compute: Callable[[], Optional[Model]], budget: Optional[float]) -> Optional[Model]:
+        self.__deadline = time.perf_counter() + budget if budget is not None else None
+        try:
+            return compute()
+        except Explain.Interrupted:
+            self.__clingo_statistics = {}
+            raise
+        finally:
+            self.__deadline = None
+
+    def __record(self, state: "Explain.State", step: int, start: tuple[float, float], cached: bool,
+                 optimal: bool = True) -> None:
+        stats = Explain.StageStats.since(start, state=state, step=step, cached=cached,
+                                         clingo_statistics=self.__clingo_statistics, optimal=optimal)
+        self.__clingo_statistics = {}
+        self.__stats.append(stats)
+        for hook in list(Explain.__stage_hooks):
+            hook(self, stats)
+
     def __compute_serialization(self) -> None:
         validate("state", self.__state, equals=Explain.State.INITIAL)
+        if self.__cache is not None:
+            self.__serialization_key = Cache.key(
+                "the_program", self.asp_program, Cache.digest_of(self.answer_set),
+                Cache.digest_of(self.additional_atoms_in_the_base), Cache.digest_of(self.atoms_to_explain),
+                str(self.__cone_of_influence),
+            )
+        self.__serialization_stages.append(self.__serialize)
+        self.__serialization_value, self.__serialization_key = self.__cached(
+            self.__serialize, Explain.State.SERIALIZED, 0, self.__serialization_key, lazy=True,
+        )
+        self.__state = max(self.__state, Explain.State.SERIALIZED)
 
-        strongly_negated_atoms = {str(atom)[1:] for atom in self.answer_set if str(atom).startswith('-')}
-        strongly_negated_atoms.update(str(atom)[1:] for atom in self.additional_atoms_in_the_base
+    def __serialize(self) -> Model:
+        answer_set, additional_atoms_in_the_base = self.answer_set, self.additional_atoms_in_the_base
+        if self.__cone_of_influence:
+            slicer = ConeOfInfluenceTransformer(
+                (atom.value.name, len(atom.value.arguments)) for atom in self.atoms_to_explain
+            )
+            self.__prepared_program = Explain.prepare_program(slicer.apply(self.asp_program))
+            cone = slicer.cone
+
+            def in_cone(atoms: Model) -> Model:
+                return Model.of_atoms(*(atom for atom in atoms
+                                        if (atom.value.name, len(atom.value.arguments)) in cone), sort=False)
+            answer_set, additional_atoms_in_the_base = in_cone(answer_set), in_cone(additional_atoms_in_the_base)
+        elif self.__prepared_program is None:
+            self.__prepared_program = Explain.prepare_program(self.asp_program)
+
+        strongly_negated_atoms = {str(atom)[1:] for atom in answer_set if str(atom).startswith('-')}
+        strongly_negated_atoms.update(str(atom)[1:] for atom in additional_atoms_in_the_base
                                       if str(atom).startswith('-'))
         strongly_negated_atoms.update(str(atom)[1:] for atom in self.atoms_to_explain if str(atom).startswith('-'))
 
-        transformer = ProgramSerializerTransformer()
-        transformed_program = transformer.apply(self.asp_program + '\n'.join(f":- {atom}, -{atom}."
-                                                                             for atom in strongly_negated_atoms))
-        model = self.compute_stable_model(
-            SERIALIZATION_ENCODING + transformed_program +
-            '\n'.join(f"true({atom})." for atom in self.answer_set) +
-            '\n'.join(f"atom({atom})." for atom in self.additional_atoms_in_the_base) +
-            '\n'.join(f"explain({atom})." for atom in self.atoms_to_explain)
-        )
-        self.__serialization = model
-        self.__state = max(self.__state, Explain.State.SERIALIZED)
+        transformer = ProgramSerializerTransformer(rules_offset=self.__prepared_program.rules,
+                                                   aggregates_offset=self.__prepared_program.aggregates)
+        transformed_constraints = transformer.apply('\n'.join(f":- {atom}, -{atom}."
+                                                              for atom in strongly_negated_atoms))
+
+        control = clingo.Control(logger=Explain.__log)
+        with clingo.ast.ProgramBuilder(control) as builder:
+            with self.__prepared_program.lock:
+                for statement in self.__prepared_program.statements:
+                    builder.add(statement)
+            clingo.ast.parse_string(transformed_constraints, builder.add)
+        with control.backend() as backend:
+            for predicate, atoms in (("true", answer_set), ("atom", additional_atoms_in_the_base),
+                                     ("explain", self.atoms_to_explain)):
+                for atom in atoms:
+                    backend.add_rule([backend.add_atom(clingo.Function(predicate, [atom.value]))])
+        control.ground([("base", [])])
+        return self.__stable_model_of(control, "SERIALIZATION_ENCODING")
 
     def __process_aggregates(self) -> Model:
-        res = self.compute_stable_model(
-            PROCESS_AGGREGATES_ENCODING + self.serialization.as_facts,
-            context=ProcessAggregatesContext()
-        )
-        validate("res", res, help_msg="No stable model. The input is likely wrong.")
-        return res
+        return ProcessAggregatesContext().process_aggregates(self.__serialization)
 
     def __compute_atoms_explained_by_initial_well_founded(self) -> Model:
-        encoding = WELL_FOUNDED_ENCODING + self.serialization.as_facts
-        return self.compute_stable_model(encoding, context=ComputeWellFoundedContext())
+        well_founded_model = ComputeWellFoundedContext.of_serialization(self.__serialization).well_founded_model
+        return Model.of_atoms(*(
+            clingo.Function("explained_by", [atom.value.arguments[0], clingo.Function("initial_well_founded")])
+            for atom in self.__serialization
+            if atom.value.name == "false" and atom.value.arguments[0] not in well_founded_model.potentially_true
+        ), sort=False)
+
+    def __prune_serialization(self) -> Model:
+        if self.__shared_prune_context is None:
+            return PruneSerializationContext.of_serialization(self.__serialization).prune(
+                self.__serialization,
+                {atom.value.arguments[0] for atom in self.__atoms_explained_by_initial_well_founded},
+            )
+        # instances of explain_many() share the serialization of all atoms to explain, parsed once
+        with Explain.__shared_lock:
+            if not self.__shared_prune_context:
+                self.__shared_prune_context.append(PruneSerializationContext.of_serialization(self.__serialization))
+        return self.__shared_prune_context[0].prune(
+            self.__serialization,
+            {atom.value.arguments[0] for atom in self.__atoms_explained_by_initial_well_founded},
+            [atom.value for atom in self.atoms_to_explain],
+        )
 
     def __compute_minimal_assumption_set(self) -> Optional[Model]:
+        if self.__minimal_assumption_sets_control is None:
+            self.__minimal_assumption_sets_control = self.__grounded_control(
+                MINIMAL_ASSUMPTION_SET_ENCODING + EXPLAIN_ENCODING,
+                self.__serialization,
+                self.__atoms_explained_by_initial_well_founded,
+            )
         while len(self.__minimal_assumption_sets_block_constraints) < len(self.__minimal_assumption_sets):
             validate("can enumerate", self.atoms_to_explain, max_len=1,
                      help_msg="At most one atom to explain must be passed to the factory method")
             mas = self.__minimal_assumption_sets[len(self.__minimal_assumption_sets_block_constraints)]
-            self.__minimal_assumption_sets_block_constraints.append(mas.block_up)
-            if len(self.atoms_to_explain) > 0 and len(self.__minimal_assumption_sets_block_constraints) == 1:
+            constraint = mas.block_up
+            if len(self.atoms_to_explain) > 0 and len(self.__minimal_assumption_sets_block_constraints) == 0:
                 atom = f"assume_false({self.atoms_to_explain[0]})"
-                self.__minimal_assumption_sets_block_constraints[0] += \
-                    f"\n:- {'not ' if atom in (str(x) for x in mas) else ''}{atom}."
-        encoding = MINIMAL_ASSUMPTION_SET_ENCODING + EXPLAIN_ENCODING + \
-                   self.serialization.as_facts + \
-                   self.atoms_explained_by_initial_well_founded.as_facts + \
-                   '\n'.join(constraint for constraint in self.__minimal_assumption_sets_block_constraints)
-        res = self.compute_stable_model(encoding)
+                constraint += f"\n:- {'not ' if atom in (str(x) for x in mas) else ''}{atom}."
+            part = f"block_{len(self.__minimal_assumption_sets_block_constraints)}"
+            self.__minimal_assumption_sets_control.add(part, [], constraint)
+            self.__minimal_assumption_sets_control.ground([(part, [])])
+            self.__minimal_assumption_sets_block_constraints.append(constraint)
+        res = self.__stable_model_of(self.__minimal_assumption_sets_control, "MINIMAL_ASSUMPTION_SET_ENCODING")
         if not self.__minimal_assumption_sets:
             validate("res", res, help_msg="No stable model. The input is likely wrong.")
         return res
 
+    @property
+    def __explanation_context(self) -> ComputeExplanationContext:
+        # the serialization does not change after pruning
+        if self.__explanation_context_value is None:
+            self.__explanation_context_value = ComputeExplanationContext.of_serialization(self.__serialization)
+        return self.__explanation_context_value
+
     def __compute_explanation_sequence(self) -> Optional[Model]:
-        instance: Final = self.minimal_assumption_set(-1).as_facts + \
-                          self.serialization.as_facts + \
-                          self.atoms_explained_by_initial_well_founded.as_facts
-        encoding = EXPLANATION_ENCODING + EXPLAIN_ENCODING + instance + \
-                   '\n'.join(model.project(Predicate.parse("explained_by/3"), 1).block_up
-                             for model in self.__explanation_sequences)
-        res = self.compute_stable_model(encoding, context=ComputeExplanationContext())
+        context = self.__explanation_context
+        if not self.__explanation_sequences_assumption_sets or \
+                self.__explanation_sequences_assumption_sets[-1] < len(self.__minimal_assumption_sets) - 1:
+            res = self.__compute_first_explanation_sequence(context)
+            if res is not None:
+                return res
+
+        instance: Final = (
+            self.__minimal_assumption_sets[-1],
+            self.__serialization,
+            self.__atoms_explained_by_initial_well_founded,
+        )
+        # one control per assumption set, extended with a constraint blocking each new sequence
+        if self.__explanation_sequences_control_assumption_set != len(self.__minimal_assumption_sets) - 1:
+            self.__explanation_sequences_control = self.__grounded_control(
+                EXPLANATION_ENCODING + EXPLAIN_ENCODING, *instance,
+            )
+            self.__explanation_sequences_control_assumption_set = len(self.__minimal_assumption_sets) - 1
+            self.__explanation_sequences_blocked = 0
+        self.__explanation_sequences_blocked = self.__block(
+            self.__explanation_sequences_control, self.__explanation_sequences_blocked,
+            self.__explanation_sequences, lambda model: model.project(Predicate.parse("explained_by/3"), 1).block_up,
+        )
+        res = self.__stable_model_of(self.__explanation_sequences_control, "EXPLANATION_ENCODING")
 
         if res is None:
             validate("must have an explanation", self.__explanation_sequences, min_len=1,
                      help_msg="No stable model. The input is likely wrong.")
             return None
 
-        encoding = INDEXED_EXPLAIN_ENCODING + instance + res.as_facts
-        res = self.compute_stable_model(encoding, context=ComputeExplanationContext())
-        assert res is not None
-
-        def fun(atom: GroundAtom) -> GroundAtom:
-            fun.index += 1
-            return GroundAtom(clingo.Function(atom.predicate_name,
-                                              [clingo.Number(fun.index)] + list(atom.arguments[1:])))
+        control = self.__grounded_control(INDEXED_EXPLAIN_ENCODING, *instance, res)
+        derived = set()
+        try:
+            self.__solve(control, lambda model: derived.update(model.symbols(shown=True)))
+        finally:
+            self.__collect_clingo_statistics("INDEXED_EXPLAIN_ENCODING", control)
+        return context.indexed_explanation_sequence([
+            tuple(atom.symbol.arguments)
+            for atom in control.symbolic_atoms.by_signature("indexed_explained_by", 2)
+            if atom.symbol in derived
+        ])
+
+    def __compute_first_explanation_sequence(self, context: ComputeExplanationContext) -> Optional[Model]:
+        """
+        The first explanation sequence of an assumption set is obtained by forward chaining, without clingo.
+        None if forward chaining cannot explain all atoms, or if the sequence was already found for a previous
+        assumption set.
+        Bump EXPLANATION_VERSION whenever its output may change for the same input.
+        """
+        explained_by = context.explanation_sequence(self.__minimal_assumption_sets[-1],
+                                                    self.__atoms_explained_by_initial_well_founded)
+        if explained_by is None:
+            return None
+        res = context.indexed_explanation_sequence(explained_by)
 
-        fun.index = 0
+        def reasons(sequence: Model) -> set:
+            return {tuple(atom.value.arguments[1:]) for atom in sequence}
 
-        return res.map(fun)
+        if self.__explanation_sequences and reasons(res) in [reasons(model) for model in self.__explanation_sequences]:
+            return None
+        return res
 
     def __compute_explanation_dag(self) -> Optional[Model]:
-        encoding = EXPLANATION_DAG_ENCODING + self.serialization.as_facts + \
-                   self.__explanation_sequences[-1].as_facts + \
-                   '\n'.join(model.filter(lambda atom: atom.arguments[-1].type != clingo.SymbolType.String)
-                             .substitute(Predicate.parse("link/2"), 1, clingo.Function("_")).block_up
-                             for model in self.__explanation_dags)
-        res = self.compute_stable_model(encoding, context=ComputeExplanationContext())
+        if not self.__explanation_dags_sequences or \
+                self.__explanation_dags_sequences[-1] < len(self.__explanation_sequences) - 1:
+            res = self.__compute_first_explanation_dag()
+            if res is not None:
+                return res
+
+        # one control per sequence, extended with a constraint blocking each new DAG
+        if self.__explanation_dags_control_sequence != len(self.__explanation_sequences) - 1:
+            self.__explanation_dags_control = self.__grounded_control(
+                EXPLANATION_DAG_ENCODING,
+                self.__serialization,
+                self.__explanation_sequences[-1],
+                Model.of_atoms(f"max_distance({self.__distance})") if self.__distance is not None else Model.empty(),
+            )
+            self.__explanation_dags_control_sequence = len(self.__explanation_sequences) - 1
+            self.__explanation_dags_blocked = 0
+        self.__explanation_dags_blocked = self.__block(
+            self.__explanation_dags_control, self.__explanation_dags_blocked, self.__explanation_dags,
+            lambda model: model.filter(lambda atom: atom.arguments[-1].type != clingo.SymbolType.String)
+            .substitute(Predicate.parse("link/2"), 1, clingo.Function("_")).block_up,
+        )
+        res = self.__stable_model_of(self.__explanation_dags_control, "EXPLANATION_DAG_ENCODING")
         if not self.__explanation_dags:
             validate("res", res, help_msg="No stable model. The input is likely wrong.")
         return res
 
-    def __compute_igraph(self, dag: Model) -> igraph.Graph:
-        graph = igraph.Graph(directed=True)
+    def __compute_first_explanation_dag(self) -> Optional[Model]:
+        """
+        The first DAG of an explanation sequence is built without clingo.
+        None if it cannot be built, or if it is blocked by a previous DAG as in the clingo path (see
+        __compute_explanation_dag), i.e., if it contains all links of a previous DAG (without index) that do not end
+        in a leaf.
+        Bump EXPLANATION_VERSION whenever its output may change for the same input.
+        """
+        res = self.__explanation_context.explanation_dag(
+            self.__explanation_sequences[-1], self.__distance,
+        )
+        if res is None:
+            return None
 
+        def links(dag: Model) -> set:
+            return {tuple(atom.value.arguments[1:]) for atom in dag
+                    if atom.value.name == "link" and atom.value.arguments[-1].type != clingo.SymbolType.String}
+
+        res_links = links(res)
+        if any(links(model) <= res_links for model in self.__explanation_dags):
+            return None
+        return res
+
+    def __compute_igraph(self, dag: Model) -> igraph.Graph:
         rules = {}
-        for rule in dag.drop(Predicate.parse("link/4")):
-            validate("predicate", rule.predicate_name, equals="original_rule")
-            rule_index = str(rule.arguments[0])
-            b64 = rule.arguments[1].string
-            variables = rule.arguments[2].string
-            rules[rule_index] = (base64.b64decode(b64).decode(), variables)
-
-        for link in dag.drop(Predicate.parse("original_rule/3")):
-            validate("link name", link.predicate_name, equals="link")
-            source = str(link.arguments[1])
-            label = link.arguments[2]
-            sink = str(link.arguments[3])
+        links = []
+        for atom in dag:
+            if atom.value.name == "original_rule":
+                rule_index, b64, variables = atom.value.arguments
+                rules[str(rule_index)] = (base64.b64decode(b64.string).decode(), variables.string)
+            else:
+                validate("link name", atom.value.name, equals="link")
+                _, source, label, sink = atom.value.arguments
+                links.append((str(source), label, str(sink)))
+
+        distance = self.__reachable(links) if len(self.__atoms_to_explain) > 0 else None
+        name2index = {}
+        vertices = {"name": [], "color": [], "label": []}
+        edges = []
+        edge_attributes = {"color": [], "label": []}
+
+        def add_vertex(name: str, color: str, label: str) -> None:
+            if name not in name2index:
+                name2index[name] = len(name2index)
+                vertices["name"].append(name)
+                vertices["color"].append(color)
+                vertices["label"].append(label)
+
+        sources = {source for source, _, _ in links}
+        for source, label, sink in links:
+            if distance is not None and source not in distance:
+                continue
+            expanded = distance is None or self.__distance is None or distance[source] < self.__distance
+            if not expanded and source in name2index:
+                continue
             reason = self.__link_reason(rules, label).split('\n', maxsplit=1)
             color = GRAPH_COLOR[reason[0]]
-            if len(graph.vs) == 0 or len(graph.vs.select(name=source)) == 0:
-                graph.add_vertex(source, color=color, label=f"{source}\n{reason[0]}")
-            if sink not in ['"true"', '"false"']:
-                if sink == '"#true"' and len(graph.vs.select(name=sink)) == 0:
-                    graph.add_vertex(sink, color=color, label=f"#true")
-                validate(f"{sink} is present", graph.vs.select(name=sink), length=1)
-                graph.add_edge(source, sink, color=color, label=reason[1] if len(reason) > 1 else None)
-
-        if len(self.__atoms_to_explain) == 0:
-            return graph
-
-        reachable_nodes = graph.neighborhood(
-            vertices=[str(atom) for atom in self.__atoms_to_explain],
-            order=len(graph.vs),
-            mode="out"
-        )
-        nodes = []
-        for reachable_nodes_element in reachable_nodes:
-            nodes.extend(reachable_nodes_element)
-        return graph.induced_subgraph(list(set(nodes)))
+            add_vertex(source, color, f"{source}\n{reason[0]}")
+            if not expanded or sink in ['"true"', '"false"']:
+                continue
+            if sink == '"#true"':
+                add_vertex(sink, color, "#true")
+            elif sink not in sources and self.__distance is not None:
+                add_vertex(sink, GRAPH_COLOR["not expanded"], f"{sink}\n...")
+            edges.append((source, sink))
+            edge_attributes["color"].append(color)
+            edge_attributes["label"].append(reason[1] if len(reason) > 1 else None)
+
+        validate("sinks are present", [sink for _, sink in edges if sink not in name2index], max_len=0)
+        edges = [(name2index[source], name2index[sink]) for source, sink in edges]
+
+        graph = igraph.Graph(directed=True)
+        graph.add_vertices(len(vertices["name"]), attributes=vertices)
+        graph.add_edges(edges, attributes=edge_attributes)
+        return graph
+
+    def __reachable(self, links: List[tuple[str, clingo.Symbol, str]]) -> Dict[str, int]:
+        """
+        Distance of the atoms reachable from the atoms to explain, up to the distance of this instance (if any).
+        """
+        successors = defaultdict(list)
+        for source, _, sink in links:
+            successors[source].append(sink)
+        roots = [str(atom) for atom in self.__atoms_to_explain]
+        validate("atoms to explain are present", [root for root in roots if root not in successors], max_len=0)
+        res = {root: 0 for root in roots}
+        queue = deque(roots)
+        while queue:
+            source = queue.popleft()
+            if self.__distance is not None and res[source] >= self.__distance:
+                continue
+            for sink in successors[source]:
+                if sink not in res:
+                    res[sink] = res[source] + 1
+                    queue.append(sink)
+        return res
+
+    @staticmethod
+    def __layered_layout(graph: igraph.Graph, sweeps: int = 4) -> igraph.Layout:
+        predecessors = [[] for _ in range(graph.vcount())]
+        successors = [[] for _ in range(graph.vcount())]
+        for source, sink in graph.get_edgelist():
+            successors[source].append(sink)
+            predecessors[sink].append(source)
+
+        layer = [0] * graph.vcount()
+        in_degree = [len(vertex_predecessors) for vertex_predecessors in predecessors]
+        queue = [vertex for vertex in range(graph.vcount()) if in_degree[vertex] == 0]
+        while queue:
+            vertex = queue.pop()
+            for sink in successors[vertex]:
+                layer[sink] = max(layer[sink], layer[vertex] + 1)
+                in_degree[sink] -= 1
+                if in_degree[sink] == 0:
+                    queue.append(sink)
+
+        layers = [[] for _ in range(max(layer, default=-1) + 1)]
+        for vertex in range(graph.vcount()):
+            layers[layer[vertex]].append(vertex)
+        position = [0.0] * graph.vcount()
+
+        def order(the_layer: List[int], neighbours: List[List[int]]) -> None:
+            def barycenter(vertex: int) -> float:
+                if not neighbours[vertex]:
+                    return position[vertex]
+                return sum(position[neighbour] for neighbour in neighbours[vertex]) / len(neighbours[vertex])
+            the_layer.sort(key=barycenter)
+            for index, vertex in enumerate(the_layer):
+                position[vertex] = index
+
+        for the_layer in layers:
+            for index, vertex in enumerate(the_layer):
+                position[vertex] = index
+        for sweep in range(sweeps):
+            for the_layer in (layers[1:] if sweep % 2 == 0 else reversed(layers[:-1])):
+                order(the_layer, predecessors if sweep % 2 == 0 else successors)
+
+        return igraph.Layout([(position[vertex] - (len(layers[layer[vertex]]) - 1) / 2, layer[vertex])
+                              for vertex in range(graph.vcount())])
 
     @staticmethod
     def __link_reason(rules, label: clingo.Symbol) -> str:
         if label.name in ["assumption", "initial_well_founded"]:
             return label.name.replace('_', ' ')
         validate("name", label.name, equals="")
-        validate("arguments", label.arguments, length=2)
+        arguments = label.arguments
+        validate("arguments", arguments, length=2)
+        reason, instance = arguments
+        instance_arguments = instance.arguments
         rule, variables = rules[
-            label.arguments[1].name if label.arguments[1].name.startswith("r") else
-            str(label.arguments[1]) if label.arguments[1].name.startswith("agg") else
-            str(label.arguments[1].arguments[0])
-
+            instance.name if instance.name.startswith("r") else
+            str(instance) if instance.name.startswith("agg") else
+            str(instance_arguments[0])
         ]
-        return f"{label.arguments[0].name.replace('_', ' ')}\n{rule}" + \
-            (f"\n{variables} => {','.join(str(x) for x in label.arguments[1].arguments)}"
-             if label.arguments[1].arguments else "")
+        return f"{reason.name.replace('_', ' ')}\n{rule}" + \
+            (f"\n{variables} => {','.join(str(x) for x in instance_arguments)}" if instance_arguments else "")
+
 
+LAYERED_LAYOUT_THRESHOLD: Final = 500
 
 GRAPH_COLOR: Final = {
     "support": "#90EE90",  # lightgreen
@@ -441,6 +1259,7 @@ GRAPH_COLOR: Final = {
     "lack of support": "#FF0000",  # red
     "choice rule": "#F08080",  # lightcoral
     "required to falsify body": "#FF8C00",  # dark orange
+    "not expanded": "#D3D3D3",  # lightgray
 }
 
 PROCESS_AGGREGATES_ENCODING: Final = """
@@ -660,15 +1479,18 @@ The answer set is encoded by facts of the form
 - true(ATOM|AGGREGATE)
 - false(ATOM|AGGREGATE)
 
+Atoms are indexed in the order in which the grounder derives indexed_explained_by/2, which can be read from the
+symbolic atoms of the control; ComputeExplanationContext numbers them and keeps only atoms connected to the query.
+
 ******************************************************************************%
 
-has_explanation(Atom) :- indexed_explained_by(_,Atom,_).
+has_explanation(Atom) :- indexed_explained_by(Atom,_).
 
-indexed_explained_by(@index(), Atom, assumption) :- assume_false(Atom).
-indexed_explained_by(@index(), Atom, initial_well_founded) :- false(Atom), explained_by(Atom, initial_well_founded).
+indexed_explained_by(Atom, assumption) :- assume_false(Atom).
+indexed_explained_by(Atom, initial_well_founded) :- false(Atom), explained_by(Atom, initial_well_founded).
 
 % true atoms can be explained by a supporting rule whose body literals already have an explanation
-indexed_explained_by(@index(), Atom, (support, Rule)) :-
+indexed_explained_by(Atom, (support, Rule)) :-
   explained_by(Atom, (support, Rule));
   true(Atom);
   head(Rule,Atom);
@@ -681,7 +1503,7 @@ indexed_explained_by(@index(), Atom, (support, Rule)) :-
 % explain false atoms : begin
 
     % false atoms can be explained if all the possibly supporting rules already have an explanation
-    indexed_explained_by(@index(), Atom, lack_of_support) :-
+    indexed_explained_by(Atom, lack_of_support) :-
       explained_by(Atom, lack_of_support);
       false(Atom);
       false_body(Rule) : head(Rule,Atom).
@@ -696,7 +1518,7 @@ indexed_explained_by(@index(), Atom, (support, Rule)) :-
 
 
     % a false atom can be explained by a rule with false head and whose body contains the false atom, and all other body literals are true
-    indexed_explained_by(@index(), Atom, (required_to_falsify_body, Rule)) :-
+    indexed_explained_by(Atom, (required_to_falsify_body, Rule)) :-
       explained_by(Atom, (required_to_falsify_body, Rule));
       false(Atom), not aggregate(Atom);
       pos_body(Rule,Atom), false_head(Rule);
@@ -715,7 +1537,7 @@ indexed_explained_by(@index(), Atom, (support, Rule)) :-
       not LowerBound <= #count{HAtom : head(Rule,HAtom), true(HAtom)} <= UpperBound.
 
     % a false atom can be explained by a choice rule with true body and whose true head atoms already reach the upper bound
-    indexed_explained_by(@index(), Atom, (choice_rule, Rule)) :-
+    indexed_explained_by(Atom, (choice_rule, Rule)) :-
       explained_by(Atom, (choice_rule, Rule));
       false(Atom);
       head(Rule,Atom), choice(Rule, LowerBound, UpperBound), UpperBound != unbounded;
@@ -728,51 +1550,8 @@ indexed_explained_by(@index(), Atom, (support, Rule)) :-
 % explain false atoms : end
 
 
-% keep only atoms connected to the query : begin
-
-    relevant(Atom) :- explain(Atom).
-    relevant(Atom) :- not explain(_); indexed_explained_by(_, Atom, _).
-
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (support, Rule));
-        pos_body(Rule, Atom').
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (support, Rule));
-        neg_body(Rule, Atom').
-
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (lack_of_support));
-        head(Rule, Atom);
-        pos_body(Rule, Atom'), false(Atom'), indexed_explained_by(Index', Atom', _), Index' < Index.
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (lack_of_support));
-        head(Rule, Atom);
-        neg_body(Rule, Atom'), true(Atom'), indexed_explained_by(Index', Atom', _), Index' < Index.
-
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (required_to_falsify_body, Rule));
-        head(Rule, Atom').
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (required_to_falsify_body, Rule));
-        pos_body(Rule, Atom').
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (required_to_falsify_body, Rule));
-        neg_body(Rule, Atom').
-
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (choice_rule, Rule));
-        head(Rule, Atom'), true(Atom').
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (choice_rule, Rule));
-        pos_body(Rule, Atom').
-    relevant(Atom') :-
-        relevant(Atom), indexed_explained_by(Index, Atom, (choice_rule, Rule));
-        neg_body(Rule, Atom').
-
-% keep only atoms connected to the query : end
-
 #show.
-#show explained_by(Index, Atom, Reason) : indexed_explained_by(Index, Atom, Reason), relevant(Atom).
+#show indexed_explained_by/2.
 
 % avoid warnings
 rule(0) :- #false.
@@ -869,12 +1648,33 @@ For each atom in the answer set, the input must contain an atom of the form
   - lack_of_support
   - (required_to_falsify_body, Rule)
   - (choice_rule, Rule)
+
+Optionally, the input can contain
+- max_distance(DISTANCE)
+  to link only atoms at distance less than DISTANCE from the atoms to explain, given by facts of the form
+  - explain(ATOM)
+  Distances are computed on the links that can be chosen (so that they do not depend on the choice), and may therefore
+  be shorter than in the DAG.
 ******************************************************************************%
 
-link(Index, Atom, Reason, BAtom) :- explained_by(Index, Atom, Reason);
+expand(Index, Atom, Reason) :- explained_by(Index, Atom, Reason), not max_distance(_).
+expand(Index, Atom, Reason) :- explained_by(Index, Atom, Reason), reached(Atom, Distance), max_distance(MaxDistance),
+    Distance < MaxDistance.
+
+reached(Atom, 0) :- explain(Atom), max_distance(_).
+reached(Atom', Distance + 1) :- reached(Atom, Distance), max_distance(MaxDistance), Distance < MaxDistance;
+    can_link(Atom, Atom').
+
+can_link(Atom, BAtom) :- max_distance(_), explained_by(_, Atom, (_, Rule)), pos_body(Rule, BAtom).
+can_link(Atom, BAtom) :- max_distance(_), explained_by(_, Atom, (_, Rule)), neg_body(Rule, BAtom).
+can_link(Atom, HAtom) :- max_distance(_), explained_by(_, Atom, (Kind, Rule)), Kind != support, head(Rule, HAtom).
+can_link(Atom, BAtom) :- max_distance(_), explained_by(_, Atom, lack_of_support), head(Rule, Atom), pos_body(Rule, BAtom).
+can_link(Atom, BAtom) :- max_distance(_), explained_by(_, Atom, lack_of_support), head(Rule, Atom), neg_body(Rule, BAtom).
+
+link(Index, Atom, Reason, BAtom) :- expand(Index, Atom, Reason);
     Reason = (support, Rule);
     pos_body(Rule, BAtom).
-link(Index, Atom, Reason, BAtom) :- explained_by(Index, Atom, Reason);
+link(Index, Atom, Reason, BAtom) :- expand(Index, Atom, Reason);
     Reason = (support, Rule);
     neg_body(Rule, BAtom).
 
@@ -884,37 +1684,37 @@ link(Index, Atom, Reason, BAtom) :- explained_by(Index, Atom, Reason);
     link(Index, Atom, (lack_of_support, Rule), BAtom) : 
         neg_body(Rule, BAtom), true (BAtom), explained_by(Index', BAtom, _), Index' < Index
 } = 1 :- 
-    explained_by(Index, Atom, Reason);
+    expand(Index, Atom, Reason);
     Reason = lack_of_support;
     head(Rule, Atom).
 
-link(Index, Atom, Reason, HAtom) :- explained_by(Index, Atom, Reason);
+link(Index, Atom, Reason, HAtom) :- expand(Index, Atom, Reason);
     Reason = (required_to_falsify_body, Rule);
     head(Rule, HAtom).
-link(Index, Atom, Reason, BAtom) :- explained_by(Index, Atom, Reason);
+link(Index, Atom, Reason, BAtom) :- expand(Index, Atom, Reason);
     Reason = (required_to_falsify_body, Rule);
     pos_body(Rule, BAtom), BAtom != Atom.
-link(Index, Atom, Reason, BAtom) :- explained_by(Index, Atom, Reason);
+link(Index, Atom, Reason, BAtom) :- expand(Index, Atom, Reason);
     Reason = (required_to_falsify_body, Rule);
     neg_body(Rule, BAtom).
 
-link(Index, Atom, Reason, HAtom) :- explained_by(Index, Atom, Reason);
+link(Index, Atom, Reason, HAtom) :- expand(Index, Atom, Reason);
     Reason = (choice_rule, Rule);
     head(Rule, HAtom), true(HAtom).
-link(Index, Atom, Reason, BAtom) :- explained_by(Index, Atom, Reason);
+link(Index, Atom, Reason, BAtom) :- expand(Index, Atom, Reason);
     Reason = (choice_rule, Rule);
     pos_body(Rule, BAtom).
-link(Index, Atom, Reason, BAtom) :- explained_by(Index, Atom, Reason);
+link(Index, Atom, Reason, BAtom) :- expand(Index, Atom, Reason);
     Reason = (choice_rule, Rule);
     neg_body(Rule, BAtom).
 
 #show.
 #show link(Index, Atom, Reason, Atom') : link(Index, Atom, Reason, Atom').
-#show link(Index, Atom, Reason, "true") : explained_by(Index, Atom, Reason), true(Atom),
+#show link(Index, Atom, Reason, "true") : expand(Index, Atom, Reason), true(Atom),
     #count{Atom' : link(Index, Atom, _, Atom')} = 0.
-#show link(Index, Atom, Reason, "#true") : explained_by(Index, Atom, Reason), true(Atom),
+#show link(Index, Atom, Reason, "#true") : expand(Index, Atom, Reason), true(Atom),
     #count{Atom' : link(Index, Atom, _, Atom')} = 0, Reason = (support, Rule), choice(Rule, _, _).
-#show link(Index, Atom, Reason, "false") : explained_by(Index, Atom, Reason), false(Atom),
+#show link(Index, Atom, Reason, "false") : expand(Index, Atom, Reason), false(Atom),
     #count{Atom' : link(Index, Atom, _, Atom')} = 0.
 #show original_rule/3.
 
@@ -929,6 +1729,8 @@ aggregate(0) :- #false.
 true(0) :- #false.
 false(0) :- #false.
 explained_by(0,0,0) :- #false.
+explain(0) :- #false.
+max_distance(0) :- #false.
 """
 
 SERIALIZATION_ENCODING: Final = """
@@ -998,3 +1800,22 @@ pos_body(0,0) :- #false.
 neg_body(0,0) :- #false.
 false(0) :- #false.
 """
+
+ENCODING_VERSION: Final = hashlib.sha256('\n'.join([
+    SERIALIZATION_ENCODING,
+    EXPLAIN_ENCODING,
+    MINIMAL_ASSUMPTION_SET_ENCODING,
+    EXPLANATION_ENCODING,
+    INDEXED_EXPLAIN_ENCODING,
+    EXPLANATION_DAG_ENCODING,
+    *(str(version) for version in (
+        PROCESS_AGGREGATES_VERSION,
+        WELL_FOUNDED_VERSION,
+        EXPLANATION_VERSION,
+        PRUNE_SERIALIZATION_VERSION,
+    )),
+]).encode()).hexdigest()
+"""
+Part of the cache keys of all stages, so that changing an encoding, or the version of a stage computed in Python (see
+xasp.contexts), invalidates the stored outputs.
+"""
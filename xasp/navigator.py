@@ -0,0 +1,257 @@
+"""
+Navigator graphs are stored in JSON Lines: a header {"type": "graph", "nodes": N, "links": M}, followed by N lines
+{"type": "node", "id": ..., "label": ..., "x": ..., "y": ...} and M lines
+{"type": "link", "source": ..., "target": ..., "label": ...}.
+The file can be zlib-compressed as a whole; readers detect compression from its first byte.
+"""
+import json
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Final, Iterable, Iterator
+from urllib.parse import urlparse, parse_qs
+
+import igraph
+import typeguard
+from valid8 import validate
+
+CHUNK_SIZE: Final = 64 * 1024
+
+
+@typeguard.typechecked
+def write_navigator_graph(target: Path, nodes: int, links: int, node_records: Iterable[Dict[str, Any]],
+                          link_records: Iterable[Dict[str, Any]], compress: bool = False) -> None:
+    compressor = zlib.compressobj() if compress else None
+    buffer = []
+    size = 0
+
+    def lines() -> Iterator[str]:
+        yield json.dumps({"type": "graph", "nodes": nodes, "links": links}, separators=(',', ':'))
+        for the_type, records in (("node", node_records), ("link", link_records)):
+            for record in records:
+                yield json.dumps({"type": the_type, **record}, separators=(',', ':'))
+
+    with open(target, "wb") as file:
+        def flush() -> None:
+            data = ''.join(buffer).encode()
+            buffer.clear()
+            file.write(compressor.compress(data) if compressor is not None else data)
+
+        for line in lines():
+            buffer.append(line + '\n')
+            size += len(line) + 1
+            if size >= CHUNK_SIZE:
+                flush()
+                size = 0
+        flush()
+        if compressor is not None:
+            file.write(compressor.flush())
+
+
+@typeguard.typechecked
+def read_navigator_graph(source: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield the records of a navigator graph written by write_navigator_graph(), header included.
+    """
+    with open(source, "rb") as file:
+        first = file.read(1)
+        decompressor = zlib.decompressobj() if first and first[0] == 0x78 else None
+        pending = b""
+        chunk = first
+        while chunk:
+            pending += decompressor.decompress(chunk) if decompressor is not None else chunk
+            *complete, pending = pending.split(b'\n')
+            for line in complete:
+                if line:
+                    yield json.loads(line)
+            chunk = file.read(CHUNK_SIZE)
+        if decompressor is not None:
+            pending += decompressor.flush()
+        validate("trailing data", pending.strip(), max_len=0, help_msg="The file is truncated")
+
+
+@typeguard.typechecked
+class NavigatorServer:
+    """
+    A local HTTP server answering with the neighbourhood of a node of a navigator graph, so that clients can expand
+    huge graphs level by level:
+    - GET /graph returns {"nodes": N, "links": M, "roots": [...]}, where roots are the ids of the atoms to explain;
+    - GET /neighbourhood?node=ID&depth=K&mode=out returns {"nodes": [...], "links": [...]} within K links from node
+      (mode is out, in or all; node can also be given as the atom, e.g. node=a(1));
+    - GET / returns a minimal page to browse the graph.
+    Adjacency lists are computed once, so each request only visits the returned neighbourhood.
+    """
+
+    def __init__(self, graph: igraph.Graph, layout: igraph.Layout, roots: Iterable[int], host: str = "127.0.0.1",
+                 port: int = 0):
+        coords = layout.coords
+        self.__nodes = [
+            {"id": node, "label": label, "x": coords[node][0], "y": coords[node][1]}
+            for node, label in enumerate(graph.vs["label"] if graph.vcount() else [])
+        ]
+        self.__name2node = {name: node for node, name in enumerate(graph.vs["name"] if graph.vcount() else [])}
+        self.__links = [
+            {"source": source, "target": target, "label": label}
+            for (source, target), label in zip(graph.get_edgelist(), graph.es["label"] if graph.ecount() else [])
+        ]
+        self.__out_links = [[] for _ in self.__nodes]
+        self.__in_links = [[] for _ in self.__nodes]
+        for index, link in enumerate(self.__links):
+            self.__out_links[link["source"]].append(index)
+            self.__in_links[link["target"]].append(index)
+        self.__roots = list(roots)
+        self.__server = ThreadingHTTPServer((host, port), self.__handler())
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "NavigatorServer":
+        validate("not started", self.__thread is None, equals=True)
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def __enter__(self) -> "NavigatorServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def graph(self) -> Dict[str, Any]:
+        return {"nodes": len(self.__nodes), "links": len(self.__links), "roots": self.__roots}
+
+    def neighbourhood(self, node: int, depth: int = 1, mode: str = "out") -> Dict[str, Any]:
+        validate("node", node, min_value=0, max_value=len(self.__nodes) - 1)
+        validate("depth", depth, min_value=0)
+        validate("mode", mode, is_in=["out", "in", "all"])
+        nodes = {node}
+        links = set()
+        frontier = [node]
+        for _ in range(depth):
+            next_frontier = []
+            for current in frontier:
+                for link in (self.__out_links[current] if mode != "in" else []) + \
+                        (self.__in_links[current] if mode != "out" else []):
+                    links.add(link)
+                    for neighbour in (self.__links[link]["source"], self.__links[link]["target"]):
+                        if neighbour not in nodes:
+                            nodes.add(neighbour)
+                            next_frontier.append(neighbour)
+            frontier = next_frontier
+        return {
+            "nodes": [self.__nodes[node] for node in sorted(nodes)],
+            "links": [self.__links[link] for link in sorted(links)],
+        }
+
+    def node(self, value: str) -> int:
+        """
+        The id of a node, given as its id or as its atom.
+        """
+        if value.isdigit():
+            return int(value)
+        validate("node", value, is_in=self.__name2node)
+        return self.__name2node[value]
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                try:
+                    if url.path == "/":
+                        self.__send(200, NAVIGATOR_PAGE.encode(), "text/html; charset=utf-8")
+                    elif url.path == "/graph":
+                        self.__send_json(200, server.graph())
+                    elif url.path == "/neighbourhood":
+                        self.__send_json(200, server.neighbourhood(
+                            server.node(query["node"]), int(query.get("depth", 1)), query.get("mode", "out"),
+                        ))
+                    else:
+                        self.__send_json(404, {"error": f"unknown path {url.path}"})
+                except (KeyError, ValueError) as error:
+                    self.__send_json(400, {"error": str(error)})
+
+            def __send_json(self, status: int, obj: Any) -> None:
+                self.__send(status, json.dumps(obj, separators=(',', ':')).encode(), "application/json")
+
+            def __send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+NAVIGATOR_PAGE: Final = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>xasp navigator</title>
+<style>
+body { font-family: sans-serif; }
+li { list-style: none; cursor: pointer; white-space: pre-wrap; }
+li > span.reason { color: gray; font-size: smaller; }
+</style>
+</head>
+<body>
+<ul id="roots"></ul>
+<script>
+async function fetchJson(path) {
+    return (await fetch(path)).json();
+}
+
+function item(node, reason) {
+    const li = document.createElement("li");
+    li.textContent = "+ " + node.label;
+    if (reason) {
+        const span = document.createElement("span");
+        span.className = "reason";
+        span.textContent = "\\n  " + reason;
+        li.appendChild(span);
+    }
+    li.onclick = async (event) => {
+        event.stopPropagation();
+        if (li.querySelector("ul")) {
+            li.removeChild(li.querySelector("ul"));
+            return;
+        }
+        const neighbourhood = await fetchJson("/neighbourhood?node=" + node.id + "&depth=1");
+        const nodes = new Map(neighbourhood.nodes.map((n) => [n.id, n]));
+        const ul = document.createElement("ul");
+        for (const link of neighbourhood.links) {
+            ul.appendChild(item(nodes.get(link.target), link.label));
+        }
+        li.appendChild(ul);
+    };
+    return li;
+}
+
+(async () => {
+    const graph = await fetchJson("/graph");
+    const roots = document.getElementById("roots");
+    for (const root of graph.roots) {
+        const neighbourhood = await fetchJson("/neighbourhood?node=" + root + "&depth=0");
+        roots.appendChild(item(neighbourhood.nodes[0], null));
+    }
+})();
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,149 @@
+"""
+Explain many jobs in parallel, on a pool of processes or threads.
+Each process is warmed once (xasp and clingo loaded, default cache of the caller installed) and keeps the programs it
+has prepared, so that the jobs on a program it has already seen do not parse it again.
+Threads share the prepared programs (and the default cache) of the caller process, and overlap only while clingo
+grounds and solves, as it releases the GIL; the other stages are computed in Python.
+"""
+import dataclasses
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Final, Iterable, Iterator, Optional
+
+import clingo
+import typeguard
+from dumbo_asp.primitives.models import Model
+from valid8 import validate
+
+from xasp.cache import Cache, default_cache, set_default_cache
+from xasp.entities import Explain
+
+PREPARED_PROGRAMS: Final = 8
+"""
+Number of prepared programs kept by each process.
+"""
+
+
+@typeguard.typechecked
+@dataclasses.dataclass(frozen=True)
+class Job:
+    program: str
+    answer_set: Model
+    atoms_to_explain: Model
+    additional_atoms_in_the_base: Model = Model.empty()
+
+
+@typeguard.typechecked
+@dataclasses.dataclass(frozen=True)
+class Result:
+    """
+    The explanation DAG of the index-th job, or the error raised while computing it.
+    """
+    index: int
+    job: Job
+    dag: Optional[Model]
+    error: Optional[str] = None
+
+
+@typeguard.typechecked
+def explain_all(jobs: Iterable[Job], workers: Optional[int] = None, pending: Optional[int] = None,
+                threads: bool = False) -> Iterator[Result]:
+    """
+    Compute the explanation DAG of each job on workers processes (by default, one per core), yielding results as
+    soon as they are available (hence, not necessarily in the order of the jobs).
+    Jobs are consumed lazily, keeping at most pending of them (by default, twice the workers) in flight.
+    Workers use the default cache of the caller.
+    With threads=True, workers are threads of the caller process: they start immediately and exchange no data, but
+    only the time spent in clingo is parallel.
+    """
+    workers = workers if workers is not None else os.cpu_count() or 1
+    pending = pending if pending is not None else 2 * workers
+    validate("workers", workers, min_value=1)
+    validate("pending", pending, min_value=1)
+    if threads:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        # clingo is not fork-safe once loaded, so workers are spawned
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_warm_up, initargs=(default_cache(),))
+    task = _explain_in_thread if threads else _explain_in_process
+    with executor:
+        in_flight: Dict[Future, tuple[int, Job]] = {}
+
+        def collect(futures) -> Iterator[Result]:
+            for future in futures:
+                index, job = in_flight.pop(future)
+                dag, error = future.result()
+                if dag is not None and not threads:
+                    dag = _decode(dag)
+                yield Result(index=index, job=job, dag=dag, error=error)
+
+        for index, job in enumerate(jobs):
+            if len(in_flight) >= pending:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+            models = (job.answer_set, job.atoms_to_explain, job.additional_atoms_in_the_base)
+            future = executor.submit(
+                task, hashlib.sha256(job.program.encode()).hexdigest(), job.program,
+                *(models if threads else (_encode(model) for model in models)),
+            )
+            in_flight[future] = (index, job)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from collect(done)
+
+
+def _encode(model: Model) -> tuple[str, ...]:
+    # symbols are pickled as pointers into the symbol table of the process, hence models cross processes as strings
+    return tuple(str(atom) for atom in model)
+
+
+def _decode(atoms: tuple[str, ...]) -> Model:
+    return Model.of_atoms(*(clingo.parse_term(atom) for atom in atoms))
+
+
+__prepared_programs: "OrderedDict[str, Explain.PreparedProgram]" = OrderedDict()
+__prepared_programs_lock = threading.Lock()
+
+
+def _warm_up(cache: Optional[Cache]) -> None:
+    set_default_cache(None)
+    Explain.the_program("a.", the_answer_set=Model.of_atoms("a"), the_atoms_to_explain=Model.of_atoms("a"))\
+        .explanation_dag()
+    set_default_cache(cache)
+
+
+def _explain_in_process(digest: str, program: str, answer_set: tuple[str, ...], atoms_to_explain: tuple[str, ...],
+                        additional_atoms_in_the_base: tuple[str, ...]) \
+        -> tuple[Optional[tuple[str, ...]], Optional[str]]:
+    dag, error = _explain_in_thread(digest, program, _decode(answer_set), _decode(atoms_to_explain),
+                                    _decode(additional_atoms_in_the_base))
+    return _encode(dag) if dag is not None else None, error
+
+
+def _explain_in_thread(digest: str, program: str, answer_set: Model, atoms_to_explain: Model,
+                       additional_atoms_in_the_base: Model) -> tuple[Optional[Model], Optional[str]]:
+    try:
+        return Explain.the_program(
+            _prepared_program(digest, program),
+            the_answer_set=answer_set,
+            the_atoms_to_explain=atoms_to_explain,
+            the_additional_atoms_in_the_base=additional_atoms_in_the_base,
+        ).explanation_dag(), None
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+
+
+def _prepared_program(digest: str, program: str) -> Explain.PreparedProgram:
+    with __prepared_programs_lock:
+        if digest in __prepared_programs:
+            __prepared_programs.move_to_end(digest)
+        else:
+            __prepared_programs[digest] = Explain.prepare_program(program)
+            while len(__prepared_programs) > PREPARED_PROGRAMS:
+                __prepared_programs.popitem(last=False)
+        return __prepared_programs[digest]
@@ -1,9 +1,10 @@
-from typing import Optional, Any
+from typing import Optional, Any, Iterator
 
 import clingo
 import clingo.ast
 import typeguard
 
+from dumbo_asp.primitives.atoms import GroundAtom
 from dumbo_asp.primitives.models import Model
 from dumbo_asp.primitives.predicates import Predicate
 from xasp.entities import Explain
@@ -23,12 +24,13 @@ def compute_stable_model(asp_program: str, context: Optional[Any] = None) -> Opt
 
 @typeguard.typechecked
 def compute_serialization(asp_program: str, answer_set: Model, additional_atoms_in_base: Model = Model.empty(),
-                          atoms_to_explain: Model = Model.empty()) -> Model:
+                          atoms_to_explain: Model = Model.empty(), cone_of_influence: bool = False) -> Model:
     return Explain.the_program(
         asp_program,
         the_answer_set=answer_set,
         the_atoms_to_explain=atoms_to_explain,
         the_additional_atoms_in_the_base=additional_atoms_in_base,
+        cone_of_influence=cone_of_influence,
     ).serialization.drop(Predicate.parse("original_rule"))
 
 
@@ -109,3 +111,22 @@ def compute_explanation_dags(
         repeat=up_to if up_to is not None else PositiveIntegerOrUnbounded.of_unbounded()
     )
     return tuple(explain.explanation_dag(index) for index in range(explain.explanation_dags))
+
+
+@typeguard.typechecked
+def compute_explanation_dags_for(
+        asp_program: str,
+        answer_set: Model,
+        atoms_to_explain: Model,
+        additional_atoms_in_base: Model = Model.empty(),
+) -> Iterator[tuple[GroundAtom, Model]]:
+    """
+    Yield an explanation DAG for each atom to explain, as soon as it is computed (see Explain.explain_many).
+    """
+    for explain in Explain.explain_many(
+        asp_program,
+        the_answer_set=answer_set,
+        the_atoms_to_explain=atoms_to_explain,
+        the_additional_atoms_in_the_base=additional_atoms_in_base,
+    ):
+        yield explain.atoms_to_explain[0], explain.explanation_dag()
@@ -1,5 +1,7 @@
 import base64
+from collections import defaultdict
 from enum import Enum, auto
+from typing import Iterable
 
 import clingo
 import clingo.ast
@@ -56,14 +58,22 @@ class ProgramSerializerTransformer(Transformer):
         READING_BODY = auto()
         READING_AGGREGATE = auto()
 
-    def __init__(self) -> None:
+    def __init__(self, rules_offset: int = 0, aggregates_offset: int = 0) -> None:
         super().__init__()
-        self.__rule_index = 0
-        self.__agg_index = 0
+        self.__rule_index = rules_offset
+        self.__agg_index = aggregates_offset
         self.__state = None
         self.__variables = set()
         self.__definitions = []
 
+    @property
+    def last_rule_index(self) -> int:
+        return self.__rule_index
+
+    @property
+    def last_aggregate_index(self) -> int:
+        return self.__agg_index
+
     def visit_Definition(self, node):
         self.add_to_result(str(node))
 
@@ -221,3 +231,76 @@ class ProgramSerializerTransformer(Transformer):
         if self.__state == self.__state.READING_BODY:
             self.__variables.add(str(node))
         return node
+
+
+@typeguard.typechecked
+class ConeOfInfluenceTransformer(Transformer):
+    """
+    Keep only the rules that can influence the given predicates: rules whose head mentions a predicate of the cone
+    (starting from the given predicates) and constraints whose body does, adding their predicates to the cone until
+    fixpoint. Strong negation is ignored, so p and -p are the same predicate. Definitions are always kept.
+    """
+
+    def __init__(self, predicates: Iterable[tuple[str, int]]) -> None:
+        super().__init__()
+        self.__cone = set(predicates)
+        self.__statements = []
+
+    @property
+    def cone(self) -> frozenset[tuple[str, int]]:
+        return frozenset(self.__cone)
+
+    def apply(self, string: str) -> str:
+        super().apply(string)
+        kept = [heads is None for _, heads, _ in self.__statements]
+        triggers = defaultdict(list)
+        for index, (_, heads, body) in enumerate(self.__statements):
+            if heads is not None:
+                for predicate in heads or body:
+                    triggers[predicate].append(index)
+        queue = list(self.__cone)
+        while queue:
+            for index in triggers[queue.pop()]:
+                if kept[index]:
+                    continue
+                kept[index] = True
+                _, heads, body = self.__statements[index]
+                for predicate in heads | body:
+                    if predicate not in self.__cone:
+                        self.__cone.add(predicate)
+                        queue.append(predicate)
+        return '\n'.join(text for (text, _, _), keep in zip(self.__statements, kept) if keep)
+
+    def visit_Definition(self, node):
+        self.__statements.append((self.input(node.location), None, None))
+        return node
+
+    def visit_Rule(self, node):
+        heads, body = set(), set()
+        if node.head.ast_type in (ASTType.Aggregate, ASTType.Disjunction):
+            for element in node.head.elements:
+                heads.update(self.__predicates(element.literal))
+                body.update(self.__predicates(*element.condition))
+        else:
+            heads.update(self.__predicates(node.head))
+        body.update(self.__predicates(*node.body))
+        self.__statements.append((self.input(node.location), heads, body))
+        return node
+
+    @staticmethod
+    def __predicates(*nodes) -> set[tuple[str, int]]:
+        res = set()
+
+        class Collector(clingo.ast.Transformer):
+            def visit_SymbolicAtom(self, atom):
+                symbol = atom.symbol
+                if symbol.ast_type == ASTType.UnaryOperation:
+                    symbol = symbol.argument
+                if symbol.ast_type == ASTType.Function:
+                    res.add((symbol.name, len(symbol.arguments)))
+                return atom
+
+        collector = Collector()
+        for node in nodes:
+            collector(node)
+        return res